@@ -0,0 +1,240 @@
+"""
+One of the nicest properties of `Counter` (see `collections/counter.py`) is that `c[key]` never raises a `KeyError`, a
+key never seen simply has a count of 0.  The price is a dict entry for every distinct key, which is not an option once
+there are billions of them.
+
+A Count-Min sketch (Cormode & Muthukrishnan, 2005) keeps the `c[key]` interface in *fixed* memory.  It is a `depth x
+width` matrix of counters.  Every key is hashed once per row to one column; an update adds to those `depth` cells and a
+lookup returns the smallest of them:
+
+             col 0  col 1  col 2  col 3  col 4
+    row 0  [   0,     7,     0,     2,     0  ]      c["x"] = min(7, 9, 7) = 7
+    row 1  [   9,     0,     0,     0,     0  ]
+    row 2  [   0,     0,     7,     0,     1  ]
+
+Collisions can only ever *add* to a cell, so the estimate is never below the true count.  With `width = e / epsilon`
+and `depth = ln(1 / delta)` the estimate exceeds the truth by more than `epsilon * total` with probability at most
+`delta`.
+
+Note: `conservative=True` enables conservative update: a key's cells are only raised as far as `estimate + count`
+rather than all being incremented.  It never under-estimates and makes over-estimates noticeably smaller.
+
+Note: Hashes must be identical in every process for `merge` and serialisation to be meaningful, so Python's randomised
+`hash()` cannot be used.  Keys are encoded canonically instead:
+
+-> integers (Python, numpy and bools) are mixed with splitmix64, vectorised in numpy for whole integer arrays
+-> str (as UTF-8) and bytes-like keys are hashed with a seeded blake2b
+-> floats are the integer they equal when integral (1.0 and 1 are one key, as in a Counter), otherwise their 8 IEEE
+   bytes hashed with blake2b personalised with b"float"
+-> tuples hash the concatenated 8 byte hashes of their elements with blake2b personalised with b"tuple", so `(1, 2)`
+   never collides with b"\x01\x02" by construction
+-> any other key type raises TypeError
+
+Each row's column is derived from two base hashes (`h1 + row * h2`, Kirsch-Mitzenmacher).
+"""
+import hashlib
+import math
+import random
+import struct
+import time
+from collections import Counter
+from collections.abc import Mapping
+from typing import Any, Iterable, Tuple, Union
+
+import numpy as np
+
+_MASK = (1 << 64) - 1
+_GOLDEN = 0x9E3779B97F4A7C15
+_HEADER = struct.Struct("<4sIIQ?Q")
+_MAGIC = b"CMS1"
+
+
+def _mix(z: int) -> int:
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & _MASK
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & _MASK
+    return z ^ (z >> 31)
+
+
+def _mix_array(z: np.ndarray) -> np.ndarray:
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return z ^ (z >> np.uint64(31))
+
+
+class CountMinSketch:
+    def __init__(self, epsilon: float = 0.0001, delta: float = 0.001, conservative: bool = False,
+                 seed: int = 0, width: int = None, depth: int = None) -> None:
+        """
+        A fixed memory approximate Counter.
+        :param epsilon: The over-estimate bound as a fraction of the total count.
+        :param delta: The probability of exceeding that bound.
+        :param conservative: Use conservative update to reduce over-estimation.
+        :param seed: The hashing seed, sketches must share it to be merged.
+        :param width: Override the width derived from epsilon.
+        :param depth: Override the depth derived from delta.
+        """
+        self.width = width or math.ceil(math.e / epsilon)
+        self.depth = depth or math.ceil(math.log(1 / delta))
+        self.conservative = conservative
+        self.seed = seed
+        self.total = 0
+        self.table = np.zeros((self.depth, self.width), dtype=np.int64)
+        self._rows = np.arange(self.depth, dtype=np.uint64)
+
+    # -- hashing ----------------------------------------------------------------------------------
+
+    def _digest(self, raw: bytes, person: bytes = b"") -> int:
+        key = self.seed.to_bytes(8, "little")
+        return int.from_bytes(hashlib.blake2b(raw, digest_size=8, key=key, person=person).digest(), "little")
+
+    def _hash(self, key: Any) -> int:
+        if isinstance(key, (int, np.integer, np.bool_)):  # bools included, True == 1 is one key in a Counter too
+            return _mix((int(key) + _GOLDEN + self.seed) & _MASK)
+        if isinstance(key, (float, np.floating)):
+            key = float(key)
+            return self._hash(int(key)) if key.is_integer() else self._digest(struct.pack("<d", key), b"float")
+        if isinstance(key, str):
+            return self._digest(key.encode("utf-8"))
+        if isinstance(key, (bytes, bytearray, memoryview)):
+            return self._digest(key)
+        if isinstance(key, tuple):
+            return self._digest(b"".join(self._hash(part).to_bytes(8, "little") for part in key), b"tuple")
+        raise TypeError(f"can not hash a {type(key).__name__} key, use int, float, str, bytes or tuples of them")
+
+    def _base_hashes(self, key: Any) -> Tuple[int, int]:
+        h1 = self._hash(key)
+        return h1, _mix(h1) | 1
+
+    def _columns(self, key: Any) -> np.ndarray:
+        h1, h2 = self._base_hashes(key)
+        return np.array([((h1 + row * h2) & _MASK) % self.width for row in range(self.depth)], dtype=np.intp)
+
+    def _columns_many(self, keys: Any) -> np.ndarray:
+        """Return a `(len(keys), depth)` array of columns, vectorised end to end for integer arrays."""
+        if isinstance(keys, np.ndarray) and keys.dtype.kind in "iu":
+            with np.errstate(over="ignore"):
+                h1 = _mix_array(keys.astype(np.uint64) + np.uint64(_GOLDEN) + np.uint64(self.seed))
+                h2 = _mix_array(h1) | np.uint64(1)
+                columns = (h1[:, None] + self._rows[None, :] * h2[:, None]) % np.uint64(self.width)
+            return columns.astype(np.intp)
+        return np.array([self._columns(key) for key in keys], dtype=np.intp).reshape(-1, self.depth)
+
+    # -- Counter style interface ------------------------------------------------------------------
+
+    def __getitem__(self, key: Any) -> int:
+        return int(self.table[np.arange(self.depth), self._columns(key)].min())
+
+    def estimate_many(self, keys: Any) -> np.ndarray:
+        columns = self._columns_many(keys)
+        return self.table[np.arange(self.depth)[None, :], columns].min(axis=1)
+
+    def update(self, iterable: Union[Iterable, Mapping, np.ndarray], count: int = 1) -> None:
+        """
+        Add keys to the sketch, like `Counter.update`.
+        :param iterable: An iterable of keys, a mapping of key -> count or a numpy integer array.
+        :param count: The increment for each key when an iterable is given.
+        """
+        if isinstance(iterable, Mapping):
+            keys, counts = list(iterable.keys()), np.fromiter(iterable.values(), dtype=np.int64)
+        elif isinstance(iterable, np.ndarray):
+            keys, counts = np.unique(iterable, return_counts=True)
+            counts = counts.astype(np.int64) * count
+        else:
+            aggregated = Counter(iterable)
+            keys, counts = list(aggregated.keys()), np.fromiter(aggregated.values(), dtype=np.int64) * count
+        if not len(keys):
+            return
+        self._add(self._columns_many(keys), counts)
+
+    def add(self, key: Any, count: int = 1) -> None:
+        self._add(self._columns(key)[None, :], np.array([count], dtype=np.int64))
+
+    def _add(self, columns: np.ndarray, counts: np.ndarray) -> None:
+        rows = np.broadcast_to(np.arange(self.depth)[None, :], columns.shape)
+        self.total += int(counts.sum())
+        if not self.conservative:
+            # np.add.at accumulates correctly when two keys in the batch share a cell (fancy += would not).
+            np.add.at(self.table, (rows, columns), np.broadcast_to(counts[:, None], columns.shape))
+            return
+        targets = self.table[rows, columns].min(axis=1) + counts
+        np.maximum.at(self.table, (rows, columns), np.broadcast_to(targets[:, None], columns.shape))
+
+    # -- merging & serialisation ------------------------------------------------------------------
+
+    def merge(self, other: "CountMinSketch") -> None:
+        """
+        Merge another sketch of identical shape and seed into this one, as if it had seen both streams.
+        :param other: The sketch to fold in.
+        """
+        if (self.depth, self.width, self.seed) != (other.depth, other.width, other.seed):
+            raise ValueError("Only sketches with the same width, depth and seed can be merged")
+        self.table += other.table
+        self.total += other.total
+
+    def __iadd__(self, other: "CountMinSketch") -> "CountMinSketch":
+        self.merge(other)
+        return self
+
+    def to_bytes(self) -> bytes:
+        header = _HEADER.pack(_MAGIC, self.depth, self.width, self.seed, self.conservative, self.total)
+        return header + self.table.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "CountMinSketch":
+        magic, depth, width, seed, conservative, total = _HEADER.unpack_from(data, 0)
+        if magic != _MAGIC:
+            raise ValueError("Not a serialised CountMinSketch")
+        sketch = cls(conservative=conservative, seed=seed, width=width, depth=depth)
+        sketch.table = np.frombuffer(data, dtype=np.int64, offset=_HEADER.size).reshape(depth, width).copy()
+        sketch.total = total
+        return sketch
+
+    def save(self, path: str) -> None:
+        with open(path, "wb") as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path: str) -> "CountMinSketch":
+        with open(path, "rb") as f:
+            return cls.from_bytes(f.read())
+
+    def __repr__(self) -> str:
+        return f"CountMinSketch(depth={self.depth}, width={self.width}, total={self.total})"
+
+
+# ------------------------------------------------------------------------------------------------
+
+
+def counter_like_lookups():
+    sketch = CountMinSketch(epsilon=0.001, delta=0.01)
+    sketch.update("Hello World")
+    print(sketch["l"], sketch["z"])  # 3 0, never a KeyError
+    sketch.update({"l": 10})
+    print(sketch["l"])  # 13
+
+    shard = CountMinSketch(epsilon=0.001, delta=0.01)
+    shard.update(np.array([1, 1, 2, 3]))
+    restored = CountMinSketch.from_bytes(shard.to_bytes())
+    restored += shard
+    print(restored[1], restored.total)  # 4 8
+
+
+def benchmark_accuracy(size: int = 2_000_000, distinct: int = 1_000_000):
+    keys = np.array(random.choices(range(distinct), weights=[1 / r for r in range(1, distinct + 1)], k=size))
+    exact = Counter(keys.tolist())
+    probe = np.array(random.sample(sorted(exact), 10_000))
+    truth = np.array([exact[key] for key in probe.tolist()])
+    for conservative in (False, True):
+        sketch = CountMinSketch(epsilon=0.0005, delta=0.001, conservative=conservative)
+        start = time.perf_counter()
+        sketch.update(keys)
+        elapsed = time.perf_counter() - start
+        error = sketch.estimate_many(probe) - truth
+        print(f"conservative={conservative!s:<5} {size / elapsed / 1e6:6.1f}M keys/s  "
+              f"mean over-estimate: {error.mean():.2f}  max: {error.max()}  "
+              f"memory: {sketch.table.nbytes / 1e6:.1f}MB vs ~{len(exact) * 100 / 1e6:.0f}MB for the Counter")
+
+
+if __name__ == '__main__':
+    counter_like_lookups()
+    benchmark_accuracy()
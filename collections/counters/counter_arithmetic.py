@@ -0,0 +1,244 @@
+"""
+Two corners of the `Counter` API (see `collections/counter.py`) do far more work than they need to once counts are big.
+
+`elements()` repeats each key once per count.  A key counted 5,000,000 times produces 5,000,000 separate items, even
+though it is fully described by the pair `(key, 5_000_000)`.
+
+`+ - & |` build a brand new Counter, looking up and storing every key one at a time in Python, and the in-place forms
+(`+=` and friends) do the same plus a second pass to strip non positive counts.
+
+This module offers:
+
+-> `elements_runs(counter)` yields `(key, run_length)` pairs: the run-length encoding of `elements()`
+-> `elements_blocks(counter, block)` yields numpy arrays of at most `block` elements, built with `np.repeat` / `np.full`,
+   for consumers that want the expanded elements but can process them vectorised
+-> `KeyIndex` + `CounterArray`: Counters that share one key index store their counts as aligned int64 arrays, position
+   `i` of every array is the count of `index.keys[i]`.  Arithmetic between them is then a single numpy ufunc over two
+   arrays, and the in-place variants write into the existing array with `out=` so no temporaries are allocated.
+
+Note: Results follow Counter semantics exactly: `+ - & |` (and their in-place forms) only keep strictly positive
+counts, which for an aligned array means clipping at 0 (a count of 0 means 'not present').
+
+Note: Aligning a Counter to an index costs one pass over that Counter; it pays off when the same Counters are combined
+many times, or when they were produced aligned in the first place (e.g. one row per shard of a counting job).
+"""
+import random
+import timeit
+from collections import Counter
+from typing import Any, Dict, Hashable, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+
+def elements_runs(counter: Counter) -> Iterator[Tuple[Hashable, int]]:
+    """
+    Yield `(key, count)` for every key with a positive count, the run-length form of `Counter.elements()`.
+    :param counter: The counter to expand.
+    """
+    for key, count in counter.items():
+        if count > 0:
+            yield key, count
+
+
+def elements_blocks(counter: Counter, block: int = 65_536, dtype: Any = None) -> Iterator[np.ndarray]:
+    """
+    Yield the elements of `counter` as numpy arrays of at most `block` items, in `Counter.elements()` order.
+    :param counter: The counter to expand.
+    :param block: The maximum number of elements per array.
+    :param dtype: The dtype of the produced arrays, inferred from the keys when omitted.
+    """
+    keys: List[Hashable] = []
+    counts: List[int] = []
+    pending = 0
+    for key, count in elements_runs(counter):
+        while count > 0:
+            take = min(count, block - pending)
+            keys.append(key)
+            counts.append(take)
+            pending += take
+            count -= take
+            if pending == block:
+                yield _repeat(keys, counts, dtype)
+                keys, counts, pending = [], [], 0
+    if pending:
+        yield _repeat(keys, counts, dtype)
+
+
+def _repeat(keys: List[Hashable], counts: List[int], dtype: Any) -> np.ndarray:
+    if len(keys) == 1:
+        return np.full(counts[0], keys[0], dtype=dtype)  # one long run, no repeat bookkeeping needed.
+    return np.repeat(np.array(keys, dtype=dtype), counts)
+
+
+class KeyIndex:
+    def __init__(self, keys: Iterable[Hashable] = ()) -> None:
+        """
+        A shared, append only mapping of key -> position used to align many counters.
+        :param keys: The initial keys.
+        """
+        self.keys: List[Hashable] = []
+        self.positions: Dict[Hashable, int] = {}
+        for key in keys:
+            self.add(key)
+
+    @classmethod
+    def from_counters(cls, *counters: Counter) -> "KeyIndex":
+        index = cls()
+        for counter in counters:
+            for key in counter:
+                index.add(key)
+        return index
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def add(self, key: Hashable) -> int:
+        position = self.positions.get(key)
+        if position is None:
+            position = self.positions[key] = len(self.keys)
+            self.keys.append(key)
+        return position
+
+    def align(self, counter: Counter) -> "CounterArray":
+        """
+        Return `counter` as a CounterArray over this index, keys not yet indexed are added.
+        :param counter: The counter to align.
+        """
+        positions = np.fromiter((self.add(key) for key in counter), dtype=np.intp, count=len(counter))
+        counts = np.zeros(len(self), dtype=np.int64)
+        counts[positions] = np.fromiter(counter.values(), dtype=np.int64, count=len(counter))
+        return CounterArray(self, counts)
+
+
+class CounterArray:
+    def __init__(self, index: KeyIndex, counts: Optional[np.ndarray] = None) -> None:
+        """
+        Counts stored as an int64 array aligned to a shared KeyIndex.
+        :param index: The shared key index.
+        :param counts: The aligned counts, zeros when omitted.
+        """
+        self.index = index
+        self.counts = np.zeros(len(index), dtype=np.int64) if counts is None else counts
+
+    def _aligned(self, other: "CounterArray") -> np.ndarray:
+        if other.index is not self.index:
+            raise ValueError("CounterArrays must share the same KeyIndex to be combined")
+        # The index is append only, so an array created before keys were added is simply shorter.
+        if len(self.counts) < len(self.index):
+            self.counts = np.concatenate([self.counts, np.zeros(len(self.index) - len(self.counts), np.int64)])
+        if len(other.counts) < len(self.counts):
+            return np.concatenate([other.counts, np.zeros(len(self.counts) - len(other.counts), np.int64)])
+        return other.counts
+
+    def __getitem__(self, key: Hashable) -> int:
+        position = self.index.positions.get(key)
+        if position is None or position >= len(self.counts):
+            return 0
+        return int(self.counts[position])
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self.counts))
+
+    def __eq__(self, other: Any) -> bool:
+        return self.to_counter() == (other.to_counter() if isinstance(other, CounterArray) else other)
+
+    def __repr__(self) -> str:
+        return f"CounterArray({dict(self.most_common(5))!r})"
+
+    def to_counter(self) -> Counter:
+        positions = np.flatnonzero(self.counts)
+        keys = self.index.keys
+        return Counter({keys[p]: c for p, c in zip(positions.tolist(), self.counts[positions].tolist())})
+
+    def most_common(self, n: Optional[int] = None) -> List[Tuple[Hashable, int]]:
+        positions = np.flatnonzero(self.counts)
+        counts = self.counts[positions]
+        if n is not None and n < len(positions):
+            top = np.argpartition(-counts, n)[:n]
+            positions, counts = positions[top], counts[top]
+        order = np.argsort(-counts, kind="stable")
+        keys = self.index.keys
+        return [(keys[p], c) for p, c in zip(positions[order].tolist(), counts[order].tolist())]
+
+    def elements_runs(self) -> Iterator[Tuple[Hashable, int]]:
+        positions = np.flatnonzero(self.counts > 0)
+        keys = self.index.keys
+        for position, count in zip(positions.tolist(), self.counts[positions].tolist()):
+            yield keys[position], count
+
+    # -- arithmetic, Counter semantics: only strictly positive counts survive ----------------------
+
+    def _binary(self, other: "CounterArray", ufunc) -> "CounterArray":
+        result = ufunc(self.counts, self._aligned(other))
+        np.maximum(result, 0, out=result)
+        return CounterArray(self.index, result)
+
+    def _inplace(self, other: "CounterArray", ufunc) -> "CounterArray":
+        ufunc(self.counts, self._aligned(other), out=self.counts)
+        np.maximum(self.counts, 0, out=self.counts)
+        return self
+
+    def __add__(self, other: "CounterArray") -> "CounterArray":
+        return self._binary(other, np.add)
+
+    def __sub__(self, other: "CounterArray") -> "CounterArray":
+        return self._binary(other, np.subtract)
+
+    def __and__(self, other: "CounterArray") -> "CounterArray":
+        return self._binary(other, np.minimum)
+
+    def __or__(self, other: "CounterArray") -> "CounterArray":
+        return self._binary(other, np.maximum)
+
+    def __iadd__(self, other: "CounterArray") -> "CounterArray":
+        return self._inplace(other, np.add)
+
+    def __isub__(self, other: "CounterArray") -> "CounterArray":
+        return self._inplace(other, np.subtract)
+
+    def __iand__(self, other: "CounterArray") -> "CounterArray":
+        return self._inplace(other, np.minimum)
+
+    def __ior__(self, other: "CounterArray") -> "CounterArray":
+        return self._inplace(other, np.maximum)
+
+
+# ------------------------------------------------------------------------------------------------
+
+
+def run_length_elements():
+    c = Counter(a=3, b=0, c=-1, d=5_000_000)
+    print(list(elements_runs(c)))  # [('a', 3), ('d', 5000000)]
+    blocks = list(elements_blocks(Counter({7: 3, 9: 2}), block=4))
+    print([block.tolist() for block in blocks])  # [[7, 7, 7, 9], [9]]
+
+
+def aligned_arithmetic():
+    left, right = Counter(a=3, b=1, c=2), Counter(a=1, b=4, d=1)
+    index = KeyIndex.from_counters(left, right)
+    x, y = index.align(left), index.align(right)
+    print((x + y).to_counter() == left + right)  # True
+    print((x - y).to_counter() == left - right)  # True
+    print((x & y).to_counter() == (left & right), (x | y).to_counter() == (left | right))  # True True
+    x -= y
+    print(x.to_counter())  # Counter({'a': 2, 'c': 2})
+
+
+def benchmark_arithmetic(keys: int = 2_000_000):
+    left = Counter({i: random.randint(1, 100) for i in range(keys)})
+    right = Counter({i: random.randint(1, 100) for i in range(0, keys * 2, 2)})
+    index = KeyIndex.from_counters(left, right)
+    x, y = index.align(left), index.align(right)
+    print(f"Counter  a + b:       {timeit.timeit(lambda: left + right, number=3) / 3:.3f}s")
+    print(f"Counter  a - b:       {timeit.timeit(lambda: left - right, number=3) / 3:.3f}s")
+    print(f"aligned  a + b:       {timeit.timeit(lambda: x + y, number=3) / 3:.4f}s")
+    print(f"aligned  a - b:       {timeit.timeit(lambda: x - y, number=3) / 3:.4f}s")
+    print(f"aligned  a += b:      {timeit.timeit(lambda: x.__iadd__(y), number=3) / 3:.4f}s  (no temporaries)")
+    print(f"elements() length:    {timeit.timeit(lambda: sum(1 for _ in left.elements()), number=1):.3f}s")
+    print(f"elements_runs total:  {timeit.timeit(lambda: sum(n for _, n in elements_runs(left)), number=1):.3f}s")
+
+
+if __name__ == '__main__':
+    run_length_elements()
+    aligned_arithmetic()
+    benchmark_arithmetic()
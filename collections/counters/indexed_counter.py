@@ -0,0 +1,188 @@
+"""
+`Counter.most_common(n)` (see `collections/counter.py`) does its work at *read* time: `heapq.nlargest(n, ...)` over
+every key, or a full `sorted()` when `n` is omitted.  A dashboard polling the top 10 a hundred times a second over a
+Counter of a million keys re-examines those million keys a hundred times a second, even if only a handful changed.
+
+`IndexedCounter` moves that work to *write* time.  Alongside the normal Counter dict it keeps every key filed in a
+bucket by its current count, plus a sorted list of the distinct counts in use:
+
+    _counts  = [-1, 0, 2, 7]
+    _buckets = {7: {"a"}, 2: {"b", "c"}, 0: {"d"}, -1: {"e"}}
+
+A mutation moves one key from one bucket to another.  `most_common(n)` walks the buckets from the highest count down and
+stops after `n` keys, so its cost is O(n) (plus the few buckets passed), no matter how many keys are held.  The same
+buckets answer `rank(key)` and `percentile(key)` without sorting anything.
+
+Note: It is a real `Counter` subclass.  Zero and negative counts are kept exactly as Counter keeps them and show up in
+`most_common()`; `+ - & |`, `elements()`, `total()` etc. are inherited unchanged.  Every write path is routed through
+`__setitem__` / `__delitem__` so the index can not drift (Counter's own `update` has C fast paths that bypass them).
+
+Note: Keys with *equal* counts come back in the order they reached that count, whereas Counter falls back to insertion
+order.  Only the order of ties differs.
+
+Note: Rank and percentile walk the buckets above (or below) the key's count, O(distinct counts).  Distinct counts grow
+far more slowly than keys: `d` distinct positive counts need a total of at least `d * (d + 1) / 2`.
+"""
+import bisect
+import numbers
+import random
+import timeit
+from collections import Counter
+from collections.abc import Mapping
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+_MISSING = object()
+
+
+class IndexedCounter(Counter):
+    def __init__(self, iterable: Any = None, /, **kwargs: int) -> None:
+        """
+        A Counter that keeps its keys indexed by count, making most_common(n) O(n).
+        :param iterable: An iterable of elements or a mapping of element -> count, exactly as for Counter.
+        """
+        self._buckets: Dict[int, Dict[Hashable, None]] = {}
+        self._counts: List[int] = []
+        super().__init__(iterable, **kwargs)
+
+    # -- every mutation funnels through these two methods -------------------------------------------------
+
+    def __setitem__(self, key: Hashable, count: int) -> None:
+        if not isinstance(count, numbers.Real):
+            # Checked before any mutation: the sorted count index can only hold orderable numbers.
+            raise TypeError(f"IndexedCounter counts must be numbers, not {type(count).__name__}")
+        old = dict.get(self, key, _MISSING)
+        if old is not _MISSING:
+            if old == count:
+                return
+            self._unindex(key, old)
+        dict.__setitem__(self, key, count)
+        self._index(key, count)
+
+    def __delitem__(self, key: Hashable) -> None:
+        # Like Counter, deleting a missing key is not an error.
+        old = dict.get(self, key, _MISSING)
+        if old is not _MISSING:
+            self._unindex(key, old)
+            dict.__delitem__(self, key)
+
+    def _index(self, key: Hashable, count: int) -> None:
+        bucket = self._buckets.get(count)
+        if bucket is None:
+            bucket = self._buckets[count] = {}
+            bisect.insort(self._counts, count)
+        bucket[key] = None
+
+    def _unindex(self, key: Hashable, count: int) -> None:
+        bucket = self._buckets[count]
+        del bucket[key]
+        if not bucket:
+            del self._buckets[count]
+            del self._counts[bisect.bisect_left(self._counts, count)]
+
+    # -- Counter / dict methods that would otherwise bypass the index ---------------------------------------
+
+    def update(self, iterable: Any = None, /, **kwargs: int) -> None:
+        self._apply(iterable, kwargs, 1)
+
+    def subtract(self, iterable: Any = None, /, **kwargs: int) -> None:
+        self._apply(iterable, kwargs, -1)
+
+    def _apply(self, iterable: Any, kwargs: Dict[str, int], sign: int) -> None:
+        if iterable is not None:
+            # Let a plain Counter tally raw elements in C, then apply one change per distinct key.
+            counts = iterable if isinstance(iterable, Mapping) else Counter(iterable)
+            for key, count in counts.items():
+                self[key] = dict.get(self, key, 0) + sign * count
+        for key, count in kwargs.items():
+            self[key] = dict.get(self, key, 0) + sign * count
+
+    def pop(self, key: Hashable, *default: Any) -> Any:
+        old = dict.get(self, key, _MISSING)
+        if old is _MISSING:
+            return dict.pop(self, key, *default)
+        del self[key]
+        return old
+
+    def popitem(self) -> Tuple[Hashable, int]:
+        key, count = dict.popitem(self)
+        self._unindex(key, count)
+        return key, count
+
+    def setdefault(self, key: Hashable, default: int = 0) -> Any:
+        if key not in self:
+            self[key] = default
+        return dict.__getitem__(self, key)
+
+    def clear(self) -> None:
+        dict.clear(self)
+        self._buckets.clear()
+        self._counts.clear()
+
+    # -- queries ------------------------------------------------------------------------------------------
+
+    def most_common(self, n: Optional[int] = None) -> List[Tuple[Hashable, int]]:
+        """
+        Return the `n` most common `(key, count)` pairs, highest first, in O(n).
+        :param n: How many pairs to return, all of them if None.
+        """
+        if n is None:
+            n = len(self)
+        result: List[Tuple[Hashable, int]] = []
+        for count in reversed(self._counts):
+            for key in self._buckets[count]:
+                if len(result) >= n:
+                    return result
+                result.append((key, count))
+        return result
+
+    def rank(self, key: Hashable) -> int:
+        """
+        Return the 1-based competition rank of `key`: one more than the number of keys with a strictly higher count.
+        :param key: The key to rank, raises KeyError if missing.
+        """
+        count = dict.__getitem__(self, key)
+        position = bisect.bisect_right(self._counts, count)
+        return 1 + sum(len(self._buckets[higher]) for higher in self._counts[position:])
+
+    def percentile(self, key: Hashable) -> float:
+        """
+        Return the percentage of keys whose count is less than or equal to that of `key`.
+        :param key: The key to look up, raises KeyError if missing.
+        """
+        count = dict.__getitem__(self, key)
+        position = bisect.bisect_right(self._counts, count)
+        at_or_below = sum(len(self._buckets[lower]) for lower in self._counts[:position])
+        return 100.0 * at_or_below / len(self)
+
+
+# ------------------------------------------------------------------------------------------------
+
+
+def counter_semantics_preserved():
+    c = IndexedCounter("abracadabra")
+    print(c.most_common(2))  # [('a', 5), ('b', 2)]
+    c.subtract("aaaaabbb")
+    print(c["a"], c["b"])  # 0 -1, zero and negative counts are kept, just like Counter
+    print(c.most_common())  # [('r', 2), ('c', 1), ('d', 1), ('a', 0), ('b', -1)]
+    print(c.rank("c"), c.percentile("a"))  # 2 40.0
+    print(isinstance(c, Counter), +c)  # True Counter({'r': 2, 'c': 1, 'd': 1})
+
+
+def benchmark_polling(keys: int = 1_000_000, polls: int = 20):
+    population = [f"user-{i}" for i in range(keys)]
+    plain, indexed = Counter(), IndexedCounter()
+    plain.update(random.choices(population, k=keys * 2))
+    indexed.update(plain)
+
+    def poll(counter):
+        for _ in range(polls):
+            counter.update(random.choices(population, k=10))
+            counter.most_common(10)
+
+    print(f"Counter:        {timeit.timeit(lambda: poll(plain), number=1):.3f}s for {polls} update + most_common(10)")
+    print(f"IndexedCounter: {timeit.timeit(lambda: poll(indexed), number=1):.3f}s for {polls} update + most_common(10)")
+
+
+if __name__ == '__main__':
+    counter_semantics_preserved()
+    benchmark_polling()
@@ -0,0 +1,211 @@
+"""
+`Counter.most_common(n)` (see `collections/counter.py`) is exact because the Counter holds a count for *every* key it
+has ever seen.  On a high cardinality stream (urls, user agents, search terms) that is exactly the problem: memory grows
+with the number of distinct keys, forever, when all we ever ask for is the top few.
+
+`TopK(k)` implements the SpaceSaving algorithm (Metwally, Agrawal & El Abbadi, 2005), a refinement of Misra-Gries:
+
+-> at most `k` keys are monitored, each with a `count` and an `error`
+-> a monitored key simply has its count incremented
+-> an unmonitored key arriving when all `k` slots are taken *replaces* the key with the smallest count `m`, inheriting
+   that count: its new count is `m + 1` and its error is `m` (it may have been seen up to `m` times before)
+
+Which gives the guarantees:
+
+-> every key's true count lies in `[count - error, count]`
+-> any key whose true frequency exceeds `total / k` is guaranteed to be monitored
+
+Note: The smallest count is found with a heap holding one (possibly stale) entry per monitored key.  Counts only ever
+increase, so a stale entry can only under-estimate; when it surfaces it is refreshed and pushed back down.
+
+Note: `update_many` pre-aggregates each batch with a real `Counter` (a C loop) and feeds the weighted counts in, which is
+still valid SpaceSaving and far fewer Python level steps for skewed streams.
+
+Note: Two summaries built over different shards can be merged (Agarwal et al. 'Mergeable Summaries', 2012): a key absent
+from a full summary may have been seen up to that summary's minimum count, so that minimum is added to both its count
+and error before the top `k` are kept.
+"""
+import heapq
+import random
+import time
+from collections import Counter
+from itertools import islice
+from typing import Any, Dict, Hashable, Iterable, List, Tuple, Union
+
+
+class TopK:
+    def __init__(self, k: int) -> None:
+        """
+        A fixed memory heavy hitters sketch.
+        :param k: The number of keys to monitor, memory is O(k) regardless of the stream.
+        """
+        if k < 1:
+            raise ValueError("k must be at least 1")
+        self.k = k
+        self.total = 0
+        self._counts: Dict[Hashable, int] = {}
+        self._errors: Dict[Hashable, int] = {}
+        self._heap: List[Tuple[int, int, Hashable]] = []
+        self._tiebreak = 0  # keeps the heap from ever comparing two (possibly unorderable) keys.
+
+    def __len__(self) -> int:
+        return len(self._counts)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._counts
+
+    def __getitem__(self, key: Hashable) -> int:
+        # Like Counter, unknown keys return 0 rather than raising a KeyError.
+        return self._counts.get(key, 0)
+
+    def __repr__(self) -> str:
+        return f"TopK(k={self.k}, {self.most_common(5)!r}...)"
+
+    def update(self, key: Hashable, count: int = 1) -> None:
+        """
+        Record `count` occurrences of `key`.
+        :param key: The hashable key seen.
+        :param count: How many times it was seen, must be positive.
+        """
+        self.total += count
+        counts = self._counts
+        if key in counts:
+            counts[key] += count
+            return
+        if len(counts) < self.k:
+            counts[key] = count
+            self._errors[key] = 0
+            self._push(count, key)
+            return
+        minimum, victim = self._pop_min()
+        del counts[victim]
+        del self._errors[victim]
+        counts[key] = minimum + count
+        self._errors[key] = minimum
+        self._push(minimum + count, key)
+
+    def update_many(self, keys: Union[Iterable[Hashable], Dict[Hashable, int]], batch: int = 65_536) -> None:
+        """
+        Record many keys, an iterable of keys or a mapping of key -> count.
+        :param keys: The keys (or counts) to add.
+        :param batch: How many keys are pre-aggregated with a Counter at a time.
+        """
+        if isinstance(keys, dict):
+            for key, count in keys.items():
+                self.update(key, count)
+            return
+        iterator = iter(keys)
+        while chunk := list(islice(iterator, batch)):
+            for key, count in Counter(chunk).items():
+                self.update(key, count)
+
+    def most_common(self, n: int = None, errors: bool = False) -> List[Tuple]:
+        """
+        Return the `n` highest estimated `(key, count)` pairs, or `(key, count, error)` triples when `errors` is set.
+        The true count of each key lies in `[count - error, count]`.
+        :param n: The number of keys to return, all monitored keys if None.
+        :param errors: Include each key's maximum over-estimate.
+        """
+        ranked = sorted(self._counts.items(), key=lambda pair: pair[1], reverse=True)[:n]
+        if errors:
+            return [(key, count, self._errors[key]) for key, count in ranked]
+        return ranked
+
+    def guaranteed(self, n: int = None) -> List[Tuple[Hashable, int]]:
+        """Return the top keys whose rank is certain: their lower bound beats the next key's upper bound."""
+        ranked = self.most_common(n + 1 if n is not None else None, errors=True)
+        certain = []
+        for position, (key, count, error) in enumerate(ranked[:n]):
+            following = ranked[position + 1][1] if position + 1 < len(ranked) else 0
+            if count - error < following:
+                break
+            certain.append((key, count))
+        return certain
+
+    def merge(self, other: "TopK") -> "TopK":
+        """
+        Return a new summary equivalent to having seen both streams.
+        :param other: Another TopK, typically built over a different shard.
+        """
+        merged = TopK(max(self.k, other.k))
+        floor_self, floor_other = self._floor(), other._floor()
+        candidates = []
+        for key in self._counts.keys() | other._counts.keys():
+            count = self._counts.get(key, floor_self) + other._counts.get(key, floor_other)
+            error = self._errors.get(key, floor_self) + other._errors.get(key, floor_other)
+            candidates.append((count, error, key))
+        for count, error, key in heapq.nlargest(merged.k, candidates, key=lambda item: item[0]):
+            merged._counts[key] = count
+            merged._errors[key] = error
+            merged._push(count, key)
+        merged.total = self.total + other.total
+        return merged
+
+    def __add__(self, other: "TopK") -> "TopK":
+        return self.merge(other)
+
+    def _floor(self) -> int:
+        # A key missing from a summary that never filled up was genuinely never seen.
+        if len(self._counts) < self.k:
+            return 0
+        return min(self._counts.values())
+
+    def _push(self, count: int, key: Hashable) -> None:
+        self._tiebreak += 1
+        heapq.heappush(self._heap, (count, self._tiebreak, key))
+
+    def _pop_min(self) -> Tuple[int, Any]:
+        heap, counts = self._heap, self._counts
+        while True:
+            count, _, key = heap[0]
+            current = counts[key]
+            if current == count:
+                heapq.heappop(heap)
+                return count, key
+            self._tiebreak += 1
+            heapq.heapreplace(heap, (current, self._tiebreak, key))
+
+
+# ------------------------------------------------------------------------------------------------
+
+
+def heavy_hitters():
+    top = TopK(3)
+    top.update_many("abracadabra")
+    print(top.most_common())  # [('a', 5), ('c', 3), ('d', 3)], 'c' and 'd' inherited an evicted count
+    print(top.most_common(1, errors=True))  # [('a', 5, 0)]
+
+    left, right = TopK(3), TopK(3)
+    left.update_many(["/home"] * 50 + ["/about"] * 5 + ["/x", "/y"])
+    right.update_many(["/home"] * 20 + ["/login"] * 30)
+    print((left + right).most_common(2))  # [('/home', 70), ('/login', ...)]
+
+
+def _zipf_stream(size: int, distinct: int) -> List[str]:
+    weights = [1 / rank for rank in range(1, distinct + 1)]
+    return [f"/page/{i}" for i in random.choices(range(distinct), weights=weights, k=size)]
+
+
+def benchmark_against_counter(size: int = 2_000_000, distinct: int = 500_000, k: int = 1_000, n: int = 100):
+    stream = _zipf_stream(size, distinct)
+
+    start = time.perf_counter()
+    exact = Counter(stream)
+    counter_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    sketch = TopK(k)
+    sketch.update_many(stream)
+    sketch_time = time.perf_counter() - start
+
+    truth = {key for key, _ in exact.most_common(n)}
+    found = {key for key, _ in sketch.most_common(n)}
+    worst = max(abs(sketch[key] - exact[key]) / exact[key] for key in found & truth)
+    print(f"Counter: {counter_time:.2f}s holding {len(exact):,} keys")
+    print(f"TopK:    {sketch_time:.2f}s holding {len(sketch):,} keys")
+    print(f"top-{n} recall: {len(truth & found) / n:.0%}, worst relative count error: {worst:.2%}")
+
+
+if __name__ == '__main__':
+    heavy_hitters()
+    benchmark_against_counter()
@@ -0,0 +1,213 @@
+"""
+A `Counter` (see `collections/counter.py`) only ever knows all-time counts.  Asking "what was popular in the last five
+minutes?" means calling `subtract()` for every event once it is older than five minutes, which in turn means holding
+on to every raw event just so it can be un-counted later.
+
+Two time aware alternatives are outlined below.
+
+`WindowedCounter(window, buckets)` divides the window into `buckets` equal slices held in a ring of sub-Counters:
+
+    window=60s, buckets=6   [ 0-10s | 10-20s | 20-30s | 30-40s | 40-50s | 50-60s ]
+                                                                            ^ events land here
+
+When time moves into the next slice, the oldest slice is dropped as a whole: the ring pointer moves on in O(1) and the
+slice's (already aggregated) counts are subtracted from a running total.  Reads go straight to that running total, a
+single dict lookup, so they cost the same as a plain Counter.  Expiry is at slice granularity, counts are exact within it.
+
+`DecayingCounter(half_life)` instead lets every event fade away continuously: an event's weight halves every
+`half_life` seconds.  Decaying every key on every tick would be O(keys); instead nothing is ever decayed in place.  An
+event at time `t` is stored pre-scaled by `2 ** ((t - t0) / half_life)` and a read multiplies by
+`2 ** (-(now - t0) / half_life)`, one shared factor for all keys.  Keys that are not touched cost nothing at all.
+
+Note: Pre-scaled values grow exponentially, so once the scale passes 2 ** 512 every stored value is rescaled once and
+`t0` moves to now.  That is O(keys), but happens at most once per 512 half lives.
+
+Note: Both accept a `clock` callable (`time.monotonic` by default) which makes them easy to drive in tests and demos.
+"""
+import math
+import time
+from collections import Counter
+from collections.abc import Mapping
+from typing import Any, Callable, Hashable, List, Optional, Tuple
+
+Clock = Callable[[], float]
+
+
+class WindowedCounter:
+    def __init__(self, window: float, buckets: int = 60, clock: Clock = time.monotonic) -> None:
+        """
+        A Counter of the events seen within the last `window` seconds.
+        :param window: The length of the sliding window in seconds.
+        :param buckets: How many slices the window is split into, more slices expire more smoothly.
+        :param clock: Returns the current time in seconds.
+        """
+        self.window = window
+        self.buckets = buckets
+        self.clock = clock
+        self._width = window / buckets
+        self._ring: List[Counter] = [Counter() for _ in range(buckets)]
+        self._epoch = self._current_epoch()
+        self._total = Counter()
+
+    def _current_epoch(self) -> int:
+        return int(self.clock() // self._width)
+
+    def _advance(self) -> None:
+        epoch = self._current_epoch()
+        elapsed = epoch - self._epoch
+        if elapsed <= 0:
+            return
+        if elapsed >= self.buckets:
+            # The whole window has passed, nothing survives.
+            self._ring = [Counter() for _ in range(self.buckets)]
+            self._total = Counter()
+        else:
+            for step in range(1, elapsed + 1):
+                slot = (self._epoch + step) % self.buckets
+                expired = self._ring[slot]
+                if expired:
+                    self._total.subtract(expired)
+                    for key in expired:
+                        if self._total[key] <= 0:
+                            del self._total[key]
+                    self._ring[slot] = Counter()
+        self._epoch = epoch
+
+    def update(self, iterable: Any = None, /, **kwargs: int) -> None:
+        self._advance()
+        counts = iterable if isinstance(iterable, Mapping) else Counter(iterable or ())
+        self._ring[self._epoch % self.buckets].update(counts, **kwargs)
+        self._total.update(counts, **kwargs)
+
+    def __getitem__(self, key: Hashable) -> int:
+        self._advance()
+        return self._total[key]
+
+    def __contains__(self, key: Hashable) -> bool:
+        self._advance()
+        return key in self._total
+
+    def __len__(self) -> int:
+        self._advance()
+        return len(self._total)
+
+    def most_common(self, n: Optional[int] = None) -> List[Tuple[Hashable, int]]:
+        self._advance()
+        return self._total.most_common(n)
+
+    def total(self) -> int:
+        self._advance()
+        return self._total.total()
+
+    def __repr__(self) -> str:
+        return f"WindowedCounter(window={self.window}, {dict(self.most_common(5))!r})"
+
+
+class DecayingCounter:
+    _RESCALE_AT = 512.0
+
+    def __init__(self, half_life: float, clock: Clock = time.monotonic) -> None:
+        """
+        A Counter whose counts decay exponentially over time.
+        :param half_life: The number of seconds after which an event counts for half as much.
+        :param clock: Returns the current time in seconds.
+        """
+        self.half_life = half_life
+        self.clock = clock
+        self._t0 = clock()
+        self._scaled: Counter = Counter()
+
+    def _exponent(self, now: float) -> float:
+        return (now - self._t0) / self.half_life
+
+    def update(self, iterable: Any = None, /, **kwargs: float) -> None:
+        now = self.clock()
+        exponent = self._exponent(now)
+        if exponent > self._RESCALE_AT:
+            self._rescale(now, exponent)
+            exponent = 0.0
+        scale = 2.0 ** exponent
+        counts = iterable if isinstance(iterable, Mapping) else Counter(iterable or ())
+        scaled = self._scaled
+        for key, count in counts.items():
+            scaled[key] += count * scale
+        for key, count in kwargs.items():
+            scaled[key] += count * scale
+
+    def _rescale(self, now: float, exponent: float) -> None:
+        factor = 2.0 ** -exponent
+        self._scaled = Counter({key: value * factor for key, value in self._scaled.items()})
+        self._t0 = now
+
+    def _factor(self) -> float:
+        return 2.0 ** -self._exponent(self.clock())
+
+    def __getitem__(self, key: Hashable) -> float:
+        return self._scaled[key] * self._factor()
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._scaled
+
+    def __len__(self) -> int:
+        return len(self._scaled)
+
+    def most_common(self, n: Optional[int] = None) -> List[Tuple[Hashable, float]]:
+        # A single shared factor never changes the order, so rank the stored values and scale only the winners.
+        factor = self._factor()
+        return [(key, value * factor) for key, value in self._scaled.most_common(n)]
+
+    def prune(self, threshold: float = 1e-3) -> None:
+        """
+        Forget keys whose decayed count has fallen below `threshold`.
+        :param threshold: The smallest decayed count worth keeping.
+        """
+        now = self.clock()
+        exponent = self._exponent(now)
+        if exponent > self._RESCALE_AT:
+            # As in update: bring the counts back to scale first, 2.0 ** -exponent may have underflowed to 0.0.
+            self._rescale(now, exponent)
+            exponent = 0.0
+        cutoff = threshold * 2.0 ** exponent
+        self._scaled = Counter({key: value for key, value in self._scaled.items() if value >= cutoff})
+
+    def __repr__(self) -> str:
+        return f"DecayingCounter(half_life={self.half_life}, {dict(self.most_common(5))!r})"
+
+
+# ------------------------------------------------------------------------------------------------
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def sliding_window():
+    clock = FakeClock()
+    recent = WindowedCounter(window=60, buckets=6, clock=clock)
+    recent.update(["/home", "/home", "/login"])
+    clock.now = 30
+    recent.update(["/home"])
+    print(recent["/home"], recent.most_common(1))  # 3 [('/home', 3)]
+    clock.now = 65  # the 0-10s slice has expired
+    print(recent["/home"], recent["/login"])  # 1 0
+
+
+def exponential_decay():
+    clock = FakeClock()
+    trending = DecayingCounter(half_life=10, clock=clock)
+    trending.update({"python": 8})
+    clock.now = 10
+    trending.update({"rust": 5})
+    print(trending["python"], trending["rust"])  # 4.0 5.0
+    clock.now = 20
+    print(trending.most_common())  # [('rust', 2.5), ('python', 2.0)]
+    print(math.isclose(trending["python"], 8 / 4))  # True
+
+
+if __name__ == '__main__':
+    sliding_window()
+    exponential_decay()
@@ -0,0 +1,249 @@
+"""
+Individual dictionary operations such as `d[k] = v` are atomic in CPython (with the GIL), but anything compound is not.
+`setdefault()` with an expensive default, a read-modify-write such as `d[k] = d.get(k, 0) + 1` or an `update()` that
+must be checked first can all interleave with other threads.  The usual fix is to wrap every access in one big lock,
+which serialises every thread in the process on that single lock.
+
+`ConcurrentDict` splits the keys across a number of 'stripes'.  Each stripe is an ordinary dict with its own lock, and a
+key always hashes to the same stripe, so threads touching different stripes never wait on one another.  Compound
+operations only hold the lock of the one stripe that owns the key:
+
+-> `compute_if_absent(key, factory)` insert `factory(key)` only if the key is missing, returns the stored value
+-> `compute(key, fn)`                  store `fn(key, current_or_None)`, returning None from `fn` removes the key
+-> `merge(key, value, fn)`             store `value` if missing, else `fn(current, value)`
+-> `pop_if(key, predicate)`            remove and return the value only if `predicate(value)` is true
+
+Note: Iteration is 'weakly consistent' (the same guarantee java's ConcurrentHashMap gives).  Each stripe is copied
+under its own lock one at a time, so an iterator never blocks writers for longer than one stripe copy, never raises
+`RuntimeError: dictionary changed size during iteration`, but may or may not reflect writes made while it runs.
+
+Note: `len()` sums the stripes one at a time and so is also only a moment-in-time estimate under concurrent writes.
+
+Note: On a GIL build threads still take turns executing bytecode, so striping mostly removes lock convoys.  On the
+free-threaded build of CPython (3.13t+, `sys._is_gil_enabled()` is False) stripes really do run in parallel.
+"""
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+_MISSING = object()
+
+
+class ConcurrentDict:
+    def __init__(self, stripes: int = 16) -> None:
+        """
+        A thread safe dictionary using hash striped locks.
+        :param stripes: The number of independent lock + dict pairs, rounded up to a power of two.
+        """
+        size = 1
+        while size < stripes:
+            size <<= 1
+        self._mask = size - 1
+        self._locks = [threading.Lock() for _ in range(size)]
+        self._tables: List[Dict[Any, Any]] = [{} for _ in range(size)]
+
+    def _stripe(self, key: Any) -> Tuple[threading.Lock, Dict[Any, Any]]:
+        index = hash(key) & self._mask
+        return self._locks[index], self._tables[index]
+
+    def __getitem__(self, key: Any) -> Any:
+        lock, table = self._stripe(key)
+        with lock:
+            return table[key]
+
+    def __setitem__(self, key: Any, value: Any) -> None:
+        lock, table = self._stripe(key)
+        with lock:
+            table[key] = value
+
+    def __delitem__(self, key: Any) -> None:
+        lock, table = self._stripe(key)
+        with lock:
+            del table[key]
+
+    def __contains__(self, key: Any) -> bool:
+        lock, table = self._stripe(key)
+        with lock:
+            return key in table
+
+    def __len__(self) -> int:
+        return sum(len(table) for table in self._tables)
+
+    def __iter__(self) -> Iterator[Any]:
+        for key, _ in self.items():
+            yield key
+
+    def __repr__(self) -> str:
+        return f"ConcurrentDict({dict(self.items())!r})"
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        lock, table = self._stripe(key)
+        with lock:
+            return table.get(key, default)
+
+    def pop(self, key: Any, default: Any = _MISSING) -> Any:
+        lock, table = self._stripe(key)
+        with lock:
+            if default is _MISSING:
+                return table.pop(key)
+            return table.pop(key, default)
+
+    def setdefault(self, key: Any, default: Any = None) -> Any:
+        lock, table = self._stripe(key)
+        with lock:
+            return table.setdefault(key, default)
+
+    def update(self, other: Any = (), **kwargs: Any) -> None:
+        items = other.items() if hasattr(other, "items") else other
+        for key, value in items:
+            self[key] = value
+        for key, value in kwargs.items():
+            self[key] = value
+
+    def compute_if_absent(self, key: Any, factory: Callable[[Any], Any]) -> Any:
+        """
+        Atomically insert `factory(key)` if `key` is missing; the factory is called at most once per missing key.
+        :param key: The key to look up.
+        :param factory: Called with the key to build the value, only when the key is absent.
+        """
+        lock, table = self._stripe(key)
+        with lock:
+            value = table.get(key, _MISSING)
+            if value is _MISSING:
+                value = table[key] = factory(key)
+            return value
+
+    def compute(self, key: Any, fn: Callable[[Any, Optional[Any]], Optional[Any]]) -> Optional[Any]:
+        """
+        Atomically replace the value of `key` with `fn(key, current)`.
+        :param key: The key to compute.
+        :param fn: Called with the key and current value (None if absent), a None result removes the key.
+        """
+        lock, table = self._stripe(key)
+        with lock:
+            value = fn(key, table.get(key))
+            if value is None:
+                table.pop(key, None)
+            else:
+                table[key] = value
+            return value
+
+    def merge(self, key: Any, value: Any, fn: Callable[[Any, Any], Optional[Any]]) -> Optional[Any]:
+        """
+        Atomically store `value` when `key` is absent, else `fn(current, value)`.
+        :param key: The key to merge into.
+        :param value: The incoming value.
+        :param fn: Combines the current and incoming values, a None result removes the key.
+        """
+        lock, table = self._stripe(key)
+        with lock:
+            current = table.get(key, _MISSING)
+            merged = value if current is _MISSING else fn(current, value)
+            if merged is None:
+                table.pop(key, None)
+            else:
+                table[key] = merged
+            return merged
+
+    def pop_if(self, key: Any, predicate: Callable[[Any], bool], default: Any = None) -> Any:
+        """
+        Atomically remove and return the value of `key` only when `predicate(value)` holds.
+        :param key: The key to test.
+        :param predicate: Called with the current value.
+        :param default: Returned when the key is absent or the predicate is false.
+        """
+        lock, table = self._stripe(key)
+        with lock:
+            value = table.get(key, _MISSING)
+            if value is _MISSING or not predicate(value):
+                return default
+            del table[key]
+            return value
+
+    def items(self) -> Iterator[Tuple[Any, Any]]:
+        # Weakly consistent: only one stripe is locked (briefly, for a copy) at any time.
+        for lock, table in zip(self._locks, self._tables):
+            with lock:
+                snapshot = list(table.items())
+            yield from snapshot
+
+    def keys(self) -> Iterator[Any]:
+        return iter(self)
+
+    def values(self) -> Iterator[Any]:
+        for _, value in self.items():
+            yield value
+
+
+class SingleLockDict:
+    """The 'one big lock' approach, kept here purely for the benchmark below."""
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._table: Dict[Any, Any] = {}
+
+    def merge(self, key: Any, value: Any, fn: Callable[[Any, Any], Any]) -> Any:
+        with self._lock:
+            current = self._table.get(key, _MISSING)
+            merged = self._table[key] = value if current is _MISSING else fn(current, value)
+            return merged
+
+
+# ------------------------------------------------------------------------------------------------
+
+
+def compound_atomic_operations():
+    d = ConcurrentDict()
+    print(d.compute_if_absent("conn", lambda key: f"connection for {key}"))  # connection for conn
+    print(d.compute_if_absent("conn", lambda key: "never called"))  # connection for conn
+    d.merge("hits", 1, lambda old, new: old + new)
+    d.merge("hits", 1, lambda old, new: old + new)
+    print(d["hits"])  # 2
+    d.compute("hits", lambda key, old: None)  # returning None removes the key
+    print("hits" in d)  # False
+    d["lease"] = 0
+    print(d.pop_if("lease", lambda expiry: expiry < time.time()))  # 0
+
+
+def no_lost_updates():
+    d = ConcurrentDict()
+
+    def work():
+        for i in range(10_000):
+            d.merge(i % 100, 1, lambda old, new: old + new)
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    print(sum(d.values()))  # 80000, every increment survived.
+
+
+def _hammer(target: Any, threads: int, operations: int) -> float:
+    def work(offset: int):
+        for i in range(operations):
+            target.merge((offset, i % 512), 1, lambda old, new: old + new)
+
+    workers = [threading.Thread(target=work, args=(n,)) for n in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return time.perf_counter() - start
+
+
+def benchmark_thread_scaling():
+    gil = getattr(sys, "_is_gil_enabled", lambda: True)()
+    print(f"GIL enabled: {gil}")
+    for threads in (1, 2, 4, 8, 16):
+        single = _hammer(SingleLockDict(), threads, 50_000)
+        striped = _hammer(ConcurrentDict(stripes=64), threads, 50_000)
+        print(f"{threads:>2} threads  single lock: {single:.3f}s  striped: {striped:.3f}s")
+
+
+if __name__ == '__main__':
+    compound_atomic_operations()
+    no_lost_updates()
+    benchmark_thread_scaling()
@@ -0,0 +1,278 @@
+"""
+Dictionaries can be nested (Note 11 in `collections/dictionary.py`), a pattern that shows up constantly when working with
+configuration files and JSON payloads.  Reaching into them is done with chained lookups such as `d["a"]["b"]["c"]`, or
+worse a chain of `.get("a", {}).get("b", {}).get("c")` to avoid a `KeyError` at any level.  Every level is a separate
+hash + probe, and every `.get(..., {})` fallback builds a throwaway dict.
+
+`NestedIndex` flattens a nested mapping *once* into a single dict keyed by path tuples:
+
+    {"db": {"host": "x", "port": 5432}}  ->  {("db", "host"): "x", ("db", "port"): 5432}
+
+so a deep lookup becomes a single hash of a tuple.  Alongside the flat dict a sorted array of the paths is kept, so that
+every path under a given prefix can be found with two `bisect` calls (a prefix scan) rather than a walk of the tree.
+
+Note: Path components do not have to be comparable with one another (think `1` and `"1"` in the same payload), so the
+sorted array is ordered by `(type name, str(component))` pairs.  A prefix still maps to one contiguous run of the array.
+
+Note: `subtree(prefix)` returns a `NestedView`, a read only `Mapping` over the index.  Nothing is copied, it simply
+prepends its prefix to each lookup, so it always reflects the latest state of the index.
+
+Note: The index does not watch the source for changes (dictionaries offer no hook for that).  When part of the source
+changes call `refresh(prefix)` to re-flatten just that subtree, or use `set` / `delete` for individual leaves.
+"""
+import bisect
+import timeit
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator, List, Tuple
+
+Path = Tuple[Any, ...]
+
+_MISSING = object()
+
+
+class _Successor:
+    """Sorts after every (type name, str) pair, so `prefix key + (_SUCCESSOR,)` bounds the run of that prefix."""
+    def __lt__(self, other: Any) -> bool:
+        return False
+
+    def __gt__(self, other: Any) -> bool:
+        return True
+
+
+_SUCCESSOR = _Successor()
+
+
+def _sort_key(path: Path) -> Tuple[Tuple[str, str], ...]:
+    return tuple((type(part).__name__, str(part)) for part in path)
+
+
+class NestedIndex:
+    def __init__(self, source: Mapping) -> None:
+        """
+        Flatten a nested mapping into a single path keyed dictionary.
+        :param source: The (nested) mapping to index, it is kept so that subtrees can be refreshed later.
+        """
+        self.source = source
+        self._flat: Dict[Path, Any] = {}
+        self._sort_keys: List[Tuple[Tuple[str, str], ...]] = []
+        self._paths: List[Path] = []
+        self._flatten_into(source, ())
+        self._rebuild_order()
+
+    def __getitem__(self, path: Path) -> Any:
+        return self._flat[path]
+
+    def __contains__(self, path: Path) -> bool:
+        return path in self._flat
+
+    def __len__(self) -> int:
+        return len(self._flat)
+
+    def get(self, path: Path, default: Any = None) -> Any:
+        return self._flat.get(path, default)
+
+    def items(self):
+        return self._flat.items()
+
+    def paths_with_prefix(self, prefix: Path) -> List[Path]:
+        """
+        Return every leaf path that starts with `prefix`, in sorted order, using a bisect prefix scan.
+        :param prefix: The path tuple to scan for, `()` returns every path.
+        """
+        low, high = self._prefix_bounds(prefix)
+        return [path for path in self._paths[low:high] if path[:len(prefix)] == prefix]
+
+    def has_prefix(self, prefix: Path) -> bool:
+        low, high = self._prefix_bounds(prefix)
+        return any(path[:len(prefix)] == prefix for path in self._paths[low:high])
+
+    def subtree(self, prefix: Path) -> "NestedView":
+        """
+        Return a lazy read only mapping rooted at `prefix`, no data is copied.
+        :param prefix: The path tuple of the subtree, raises KeyError if nothing lives under it.
+        """
+        if not self.has_prefix(prefix):
+            raise KeyError(prefix)
+        return NestedView(self, prefix)
+
+    def set(self, path: Path, value: Any) -> None:
+        """
+        Set a single leaf, keeping the sorted path array in step.
+        :param path: The full path tuple of the leaf.
+        :param value: The new value, mappings are flattened into further leaves.
+        """
+        for depth in range(1, len(path)):
+            if path[:depth] in self._flat:
+                self._remove_prefix(path[:depth])  # a leaf can not also be the parent of `path`
+        self._remove_prefix(path)
+        if isinstance(value, Mapping) and value:
+            self._insert_all(self._flatten(value, path))
+        else:
+            self._insert(path, value)
+
+    def delete(self, path: Path) -> None:
+        """
+        Remove a leaf, or every leaf under a prefix.
+        :param path: The path tuple to remove, raises KeyError if nothing lives there.
+        """
+        if not self._remove_prefix(path):
+            raise KeyError(path)
+
+    def refresh(self, prefix: Path = ()) -> None:
+        """
+        Re-flatten the subtree of the source mapping at `prefix` after it has been changed in place.
+        :param prefix: The path tuple of the changed subtree, `()` rebuilds the whole index.
+        """
+        node = self.source
+        for part in prefix:
+            if not isinstance(node, Mapping) or part not in node:
+                self._remove_prefix(prefix)  # the subtree was deleted from the source
+                return
+            node = node[part]
+        self._remove_prefix(prefix)
+        if isinstance(node, Mapping) and node:
+            self._insert_all(self._flatten(node, prefix))
+        else:
+            self._insert(prefix, node)
+
+    def _flatten(self, node: Mapping, prefix: Path) -> Dict[Path, Any]:
+        flat: Dict[Path, Any] = {}
+        stack = [(prefix, node)]
+        while stack:
+            path, current = stack.pop()
+            for key, value in current.items():
+                child = path + (key,)
+                if isinstance(value, Mapping) and value:
+                    stack.append((child, value))
+                else:
+                    flat[child] = value
+        return flat
+
+    def _flatten_into(self, node: Mapping, prefix: Path) -> None:
+        self._flat.update(self._flatten(node, prefix))
+
+    def _rebuild_order(self) -> None:
+        ordered = sorted(self._flat, key=_sort_key)
+        self._paths = ordered
+        self._sort_keys = [_sort_key(path) for path in ordered]
+
+    def _prefix_bounds(self, prefix: Path) -> Tuple[int, int]:
+        key = _sort_key(prefix)
+        low = bisect.bisect_left(self._sort_keys, key)
+        high = bisect.bisect_left(self._sort_keys, key + (_SUCCESSOR,), low)
+        return low, high
+
+    def _insert(self, path: Path, value: Any) -> None:
+        if path not in self._flat:
+            key = _sort_key(path)
+            position = bisect.bisect_left(self._sort_keys, key)
+            self._sort_keys.insert(position, key)
+            self._paths.insert(position, path)
+        self._flat[path] = value
+
+    def _insert_all(self, flat: Dict[Path, Any]) -> None:
+        if len(flat) > len(self._flat) // 8:
+            # Bulk changes are cheaper as one re-sort than as many list.insert() memmoves.
+            self._flat.update(flat)
+            self._rebuild_order()
+            return
+        for path, value in flat.items():
+            self._insert(path, value)
+
+    def _remove_prefix(self, prefix: Path) -> bool:
+        low, high = self._prefix_bounds(prefix)
+        doomed = [path for path in self._paths[low:high] if path[:len(prefix)] == prefix]
+        if len(doomed) != high - low:
+            # Distinct components with equal sort keys (same type name and str) can share the run, keep those paths.
+            kept = [i for i in range(low, high) if self._paths[i][:len(prefix)] != prefix]
+            self._paths[low:high] = [self._paths[i] for i in kept]
+            self._sort_keys[low:high] = [self._sort_keys[i] for i in kept]
+        else:
+            del self._paths[low:high]
+            del self._sort_keys[low:high]
+        for path in doomed:
+            del self._flat[path]
+        return bool(doomed)
+
+
+class NestedView(Mapping):
+    """
+    A read only window into a `NestedIndex` rooted at a prefix.  Much like the dictionary views (Note 18) it reflects
+    changes to the underlying index in real time and never builds a copy of the subtree.
+    """
+    def __init__(self, index: NestedIndex, prefix: Path) -> None:
+        self._index = index
+        self._prefix = prefix
+
+    def __getitem__(self, key: Any) -> Any:
+        path = self._prefix + (key,)
+        value = self._index.get(path, _MISSING)
+        if value is not _MISSING:
+            return value
+        if self._index.has_prefix(path):
+            return NestedView(self._index, path)
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[Any]:
+        depth = len(self._prefix)
+        seen = set()
+        for path in self._index.paths_with_prefix(self._prefix):
+            key = path[depth]
+            if key not in seen:
+                seen.add(key)
+                yield key
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __repr__(self) -> str:
+        return f"NestedView(prefix={self._prefix!r})"
+
+
+# ------------------------------------------------------------------------------------------------
+
+
+CONFIG = {
+    "database": {"primary": {"host": "db1", "port": 5432}, "replica": {"host": "db2", "port": 5433}},
+    "cache": {"ttl": 60},
+    "debug": False,
+}
+
+
+def deep_lookups():
+    index = NestedIndex(CONFIG)
+    print(index["database", "primary", "host"])  # db1
+    print(index.get(("database", "missing", "host"), "fallback"))  # fallback
+    print(index.paths_with_prefix(("database",)))
+    # [('database', 'primary', 'host'), ('database', 'primary', 'port'), ('database', 'replica', 'host'), ...]
+
+
+def lazy_subtrees():
+    index = NestedIndex(CONFIG)
+    database = index.subtree(("database",))
+    print(list(database))  # ['primary', 'replica']
+    print(database["replica"]["port"])  # 5433
+    index.set(("database", "replica", "port"), 6543)
+    print(database["replica"]["port"])  # 6543, the view is live.
+
+
+def incremental_refresh():
+    index = NestedIndex(CONFIG)
+    CONFIG["cache"]["size"] = 1024
+    index.refresh(("cache",))
+    print(index["cache", "size"])  # 1024
+
+
+def benchmark_against_chained_get():
+    index = NestedIndex(CONFIG)
+    chained = timeit.timeit(lambda: CONFIG.get("database", {}).get("primary", {}).get("port"), number=1_000_000)
+    flat = timeit.timeit(lambda: index.get(("database", "primary", "port")), number=1_000_000)
+    print(f"chained .get(): {chained:.3f}s")
+    print(f"NestedIndex:    {flat:.3f}s")
+
+
+if __name__ == '__main__':
+    deep_lookups()
+    lazy_subtrees()
+    incremental_refresh()
+    benchmark_against_chained_get()
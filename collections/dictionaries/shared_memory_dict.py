@@ -0,0 +1,333 @@
+"""
+A dictionary lives in the private heap of one process.  Hand a large read-mostly dict to a pool of `multiprocessing`
+workers and each worker receives a pickled copy which it unpickles into its own heap; 32 workers means 32 copies of
+the same data resident at once, and 32 unpickling passes before any real work starts.
+
+`SharedMemoryDict` stores the whole table inside one `multiprocessing.shared_memory.SharedMemory` block instead.  Any
+process can attach to the block by name in constant time and read it in place; the data exists once in physical memory.
+
+The block is laid out as:
+
+    header  | seq (u64) | capacity (u64) | count (u64) | arena_used (u64) | arena_size (u64) |
+    slots   | capacity x (hash u64, key_offset u64, key_length u64, value_offset u64, value_length u64) |
+    arena   | raw key and value bytes, appended one after another |
+
+The slot table is open addressed with linear probing (the same family of collision resolution the builtin dict uses).
+Keys and values are `bytes` (`str` keys are utf-8 encoded for you); anything richer must be serialised by the caller.
+
+Note: Python's `hash()` of str / bytes is randomised per process (PYTHONHASHSEED) so it cannot be shared between
+processes.  A 64 bit blake2b digest of the key bytes is used instead.
+
+Note: Concurrency uses a seqlock: one writer bumps `seq` to an odd number, mutates, then bumps it back to even.  Readers
+take no lock at all; they read `seq`, do the lookup, copy the value out and re-read `seq`.  If it changed (or was odd)
+they simply retry.  This keeps reads wait free in the common case where nothing is being written.  Only ONE process may
+write; use `create()` in the writer and `attach()` everywhere else.  A reader that keeps seeing a write in progress for
+`read_timeout` seconds (the writer died mid write) raises TimeoutError rather than spinning forever.
+
+Note: Python offers no memory fences, so the seqlock relies on the hardware keeping stores (and loads) in program order,
+as x86-64 (TSO) does.  On weakly ordered CPUs (ARM, POWER) a reader could see the new `seq` before the data it guards.
+
+Note: The arena is append only.  Overwriting a key appends the new value and repoints the slot, deleting a key leaves a
+tombstone.  Size the arena for the total bytes you expect to write over the lifetime of the block, not just live data.
+"""
+import hashlib
+import os
+import pickle
+import struct
+import sys
+import time
+from multiprocessing import Pool, resource_tracker, shared_memory
+from typing import Dict, Iterator, Optional, Tuple, Union
+
+_HEADER = struct.Struct("<QQQQQ")
+_SLOT = struct.Struct("<QQQQQ")
+_SEQ = struct.Struct("<Q")
+_DELETED = 2 ** 64 - 1
+_CREATED = set()  # blocks created by this process (inherited by forked children), tracked by its resource tracker
+
+Key = Union[str, bytes]
+
+
+def _key_bytes(key: Key) -> bytes:
+    return key.encode("utf-8") if isinstance(key, str) else bytes(key)
+
+
+def _stable_hash(key: bytes) -> int:
+    # 0 marks an empty slot, so a genuine hash of 0 is nudged to 1.
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little") or 1
+
+
+class SharedMemoryDict:
+    read_timeout: float = 1.0  # seconds a reader waits for a write in progress before giving up
+
+    def __init__(self, shm: shared_memory.SharedMemory, writer: bool) -> None:
+        """
+        Wrap an existing shared memory block, use `create()` or `attach()` rather than calling this directly.
+        :param shm: The shared memory block holding the table.
+        :param writer: Whether this process owns the block and is permitted to mutate it.
+        """
+        self.shm = shm
+        self.writer = writer
+        self._buf = shm.buf
+        _, self.capacity, _, _, self.arena_size = _HEADER.unpack_from(self._buf, 0)
+        self._mask = self.capacity - 1
+        self._slots_start = _HEADER.size
+        self._arena_start = self._slots_start + self.capacity * _SLOT.size
+
+    @classmethod
+    def create(cls, capacity: int = 1 << 16, arena_size: int = 16 * 1024 * 1024,
+               name: Optional[str] = None) -> "SharedMemoryDict":
+        """
+        Create a new (writable) shared dictionary.
+        :param capacity: The number of slots, rounded up to a power of two.  Keep it at least 1.5x the key count.
+        :param arena_size: The number of bytes reserved for keys and values.
+        :param name: An optional name for the block, by default one is generated.
+        """
+        slots = 8
+        while slots < capacity:
+            slots <<= 1
+        size = _HEADER.size + slots * _SLOT.size + arena_size
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        shm.buf[:_HEADER.size + slots * _SLOT.size] = bytes(_HEADER.size + slots * _SLOT.size)
+        _HEADER.pack_into(shm.buf, 0, 0, slots, 0, 0, arena_size)
+        _CREATED.add(shm._name)
+        return cls(shm, writer=True)
+
+    @classmethod
+    def attach(cls, name: str) -> "SharedMemoryDict":
+        """
+        Attach (read only) to a shared dictionary created by another process.
+        :param name: The `name` of the writer's block.
+        """
+        if sys.version_info >= (3, 13):
+            shm = shared_memory.SharedMemory(name=name, track=False)
+        else:
+            # Before 3.13 attaching registers the block with the resource tracker, which unlinks it when the reader
+            # exits.  Readers must never unlink the writer's block, so this block is unregistered again, unless the
+            # tracker is the writer's own (same process, or a forked child): its one entry is the writer's.
+            shm = shared_memory.SharedMemory(name=name)
+            if shm._name not in _CREATED:
+                resource_tracker.unregister(shm._name, "shared_memory")
+        return cls(shm, writer=False)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def close(self) -> None:
+        self._buf = None
+        self.shm.close()
+
+    def unlink(self) -> None:
+        self.shm.unlink()
+        _CREATED.discard(self.shm._name)
+
+    def __enter__(self) -> "SharedMemoryDict":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+        if self.writer:
+            self.unlink()
+
+    # -- reading (lock free) ----------------------------------------------------------------------
+
+    def _consistent(self, read):
+        """Run `read` until no write overlapped it, raising TimeoutError if the seqlock never settles."""
+        buf = self._buf
+        deadline = None
+        while True:
+            before = _SEQ.unpack_from(buf, 0)[0]
+            if not before & 1:  # odd: a write is in progress
+                result = read()
+                if _SEQ.unpack_from(buf, 0)[0] == before:
+                    return result
+            if deadline is None:
+                deadline = time.monotonic() + self.read_timeout
+            elif time.monotonic() > deadline:
+                raise TimeoutError(f"{self.name}: a write did not finish within {self.read_timeout}s, "
+                                   f"the writer may have died mid write")
+
+    def get(self, key: Key, default: Optional[bytes] = None) -> Optional[bytes]:
+        raw = _key_bytes(key)
+        digest = _stable_hash(raw)
+        found = self._consistent(lambda: self._read_value(raw, digest))
+        return default if found is None else found
+
+    def __getitem__(self, key: Key) -> bytes:
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key: Key) -> bool:
+        return self.get(key) is not None
+
+    def __len__(self) -> int:
+        return _HEADER.unpack_from(self._buf, 0)[2]
+
+    def items(self) -> Iterator[Tuple[bytes, bytes]]:
+        return iter(self._consistent(lambda: list(self._live_items())))
+
+    def _read_value(self, raw: bytes, digest: int) -> Optional[bytes]:
+        slot, fields = self._probe(raw, digest)
+        if fields is None or fields[4] == _DELETED:
+            return None
+        start = self._arena_start + fields[3]
+        return bytes(self._buf[start:start + fields[4]])
+
+    def _probe(self, raw: bytes, digest: int):
+        buf = self._buf
+        index = digest & self._mask
+        for _ in range(self.capacity):
+            offset = self._slots_start + index * _SLOT.size
+            fields = _SLOT.unpack_from(buf, offset)
+            if fields[0] == 0:
+                return index, None
+            if fields[0] == digest and fields[2] == len(raw):
+                start = self._arena_start + fields[1]
+                if buf[start:start + fields[2]] == raw:
+                    return index, fields
+            index = (index + 1) & self._mask
+        return None, None
+
+    def _live_items(self) -> Iterator[Tuple[bytes, bytes]]:
+        buf = self._buf
+        for index in range(self.capacity):
+            digest, key_offset, key_length, value_offset, value_length = _SLOT.unpack_from(
+                buf, self._slots_start + index * _SLOT.size)
+            if digest and value_length != _DELETED:
+                key_start = self._arena_start + key_offset
+                value_start = self._arena_start + value_offset
+                yield bytes(buf[key_start:key_start + key_length]), bytes(buf[value_start:value_start + value_length])
+
+    # -- writing (single writer, seqlock) ---------------------------------------------------------
+
+    def __setitem__(self, key: Key, value: bytes) -> None:
+        self._check_writer()
+        raw = _key_bytes(key)
+        digest = _stable_hash(raw)
+        slot, fields = self._probe(raw, digest)
+        if slot is None:
+            raise MemoryError("SharedMemoryDict slot table is full")
+        # Bytes are appended to the arena *before* the seqlock is taken, readers never look at unreferenced bytes.
+        if fields is None:
+            key_offset = self._append(raw)
+        else:
+            key_offset = fields[1]
+        value = bytes(value)  # a memoryview's len() counts items, not bytes
+        value_offset = self._append(value)
+        self._begin_write()
+        try:
+            _SLOT.pack_into(self._buf, self._slots_start + slot * _SLOT.size,
+                            digest, key_offset, len(raw), value_offset, len(value))
+            if fields is None or fields[4] == _DELETED:
+                self._add_count(1)
+        finally:
+            self._end_write()
+
+    def __delitem__(self, key: Key) -> None:
+        self._check_writer()
+        raw = _key_bytes(key)
+        digest = _stable_hash(raw)
+        slot, fields = self._probe(raw, digest)
+        if fields is None or fields[4] == _DELETED:
+            raise KeyError(key)
+        self._begin_write()
+        try:
+            _SLOT.pack_into(self._buf, self._slots_start + slot * _SLOT.size,
+                            digest, fields[1], fields[2], 0, _DELETED)
+            self._add_count(-1)
+        finally:
+            self._end_write()
+
+    def update(self, mapping: Dict[Key, bytes]) -> None:
+        for key, value in mapping.items():
+            self[key] = value
+
+    def _check_writer(self) -> None:
+        if not self.writer:
+            raise PermissionError("Only the process that created the SharedMemoryDict may write to it")
+
+    def _append(self, data: bytes) -> int:
+        seq, capacity, count, used, size = _HEADER.unpack_from(self._buf, 0)
+        if used + len(data) > size:
+            raise MemoryError("SharedMemoryDict arena is full")
+        start = self._arena_start + used
+        self._buf[start:start + len(data)] = data
+        _HEADER.pack_into(self._buf, 0, seq, capacity, count, used + len(data), size)
+        return used
+
+    def _add_count(self, delta: int) -> None:
+        seq, capacity, count, used, size = _HEADER.unpack_from(self._buf, 0)
+        _HEADER.pack_into(self._buf, 0, seq, capacity, count + delta, used, size)
+
+    def _begin_write(self) -> None:
+        _SEQ.pack_into(self._buf, 0, _SEQ.unpack_from(self._buf, 0)[0] + 1)
+
+    def _end_write(self) -> None:
+        _SEQ.pack_into(self._buf, 0, _SEQ.unpack_from(self._buf, 0)[0] + 1)
+
+
+# ------------------------------------------------------------------------------------------------
+
+
+def write_once_read_everywhere():
+    with SharedMemoryDict.create(capacity=64, arena_size=4096) as shared:
+        shared["alpha"] = b"1"
+        shared["beta"] = b"2"
+        shared["alpha"] = b"100"
+        reader = SharedMemoryDict.attach(shared.name)
+        print(reader["alpha"], reader.get("gamma", b"?"), len(reader))  # b'100' b'?' 2
+        reader.close()
+
+
+def _rss_kib() -> int:
+    # RssAnon is this process's private memory, shared memory pages are reported separately as RssShmem.
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("RssAnon:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _pickled_worker(payload: bytes) -> Tuple[float, int]:
+    before = _rss_kib()
+    start = time.perf_counter()
+    table = pickle.loads(payload)
+    table[b"key-1"]
+    return time.perf_counter() - start, _rss_kib() - before
+
+
+def _shared_worker(name: str) -> Tuple[float, int]:
+    before = _rss_kib()
+    start = time.perf_counter()
+    table = SharedMemoryDict.attach(name)
+    table[b"key-1"]
+    elapsed = time.perf_counter() - start
+    table.close()
+    return elapsed, _rss_kib() - before
+
+
+def benchmark_32_workers(keys: int = 500_000, workers: int = 32):
+    source = {f"key-{i}".encode(): os.urandom(32) for i in range(keys)}
+    payload = pickle.dumps(source, protocol=pickle.HIGHEST_PROTOCOL)
+    with SharedMemoryDict.create(capacity=keys * 2, arena_size=keys * 48) as shared:
+        shared.update(source)
+        with Pool(workers) as pool:
+            pickled = pool.map(_pickled_worker, [payload] * workers)
+            attached = pool.map(_shared_worker, [shared.name] * workers)
+    for label, results in (("pickled dict", pickled), ("SharedMemoryDict", attached)):
+        startup = max(elapsed for elapsed, _ in results)
+        rss = sum(kib for _, kib in results) / 1024
+        print(f"{label:<18} slowest startup: {startup * 1000:8.1f}ms  "
+              f"private RSS across {workers} workers: {rss:8.1f}MiB")
+
+
+if __name__ == '__main__':
+    write_once_read_everywhere()
+    benchmark_32_workers()
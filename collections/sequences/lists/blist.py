@@ -0,0 +1,348 @@
+"""
+A list is a single contiguous array of pointers.  `lst.insert(i, x)` and `del lst[i]` have to shift every pointer after
+`i` by one slot (a memmove), so they are O(n): inserting into the middle of a 10 million element list moves ~40MB of
+memory, every time.  Text editor buffers and ordered queues with cancellation in the middle do exactly that all day.
+
+`BList` stores the sequence as a B+ tree instead.  The elements live in small leaf lists of at most `_MAX` items, and
+each branch records the number of elements under each of its children (as a running prefix sum):
+
+                        Branch(offsets=[0, 5, 9])
+                       /                         \\
+        Leaf([a, b, c, d, e])              Leaf([f, g, h, i])
+
+-> index / insert / delete walk from the root to one leaf using `bisect` on the offsets, O(log n), and only shift the
+   items of that one leaf
+-> `a + b`, `extend` and slicing are O(log n) too: trees are split and joined along one root-to-leaf path while every
+   other leaf and branch is *shared* between the old and new BLists, never copied
+
+Note: Sharing is made safe by never modifying a node once it is part of a tree.  A mutation copies only the nodes on the
+path from the root to the changed leaf (copy on write, a.k.a. path copying) and swaps in the new root.  Every other
+BList sharing the old nodes is unaffected, which is why `b = a[1000:2000]` costs the same at any size.
+
+Note: Nodes that drop below `_MIN` entries after a deletion are merged with a neighbour, keeping the tree shallow.
+"""
+import bisect
+import random
+import timeit
+from collections.abc import MutableSequence
+from itertools import accumulate, islice
+from typing import Any, Iterable, Iterator, List, Optional, Tuple, Union
+
+_MAX = 64
+_MIN = _MAX // 4
+
+
+class _Leaf:
+    __slots__ = ("items",)
+    height = 0
+
+    def __init__(self, items: list) -> None:
+        self.items = items
+
+    @property
+    def size(self) -> int:
+        return len(self.items)
+
+    @property
+    def entries(self) -> list:
+        return self.items
+
+
+class _Branch:
+    __slots__ = ("children", "offsets", "height", "size")
+
+    def __init__(self, children: list) -> None:
+        self.children = children
+        self.height = children[0].height + 1
+        self.offsets = list(accumulate((child.size for child in children), initial=0))
+        self.size = self.offsets[-1]
+
+    @property
+    def entries(self) -> list:
+        return self.children
+
+    def locate(self, index: int) -> Tuple[int, int]:
+        child = min(bisect.bisect_right(self.offsets, index) - 1, len(self.children) - 1)
+        return child, index - self.offsets[child]
+
+
+Node = Union[_Leaf, _Branch]
+
+
+def _make(height: int, entries: list) -> Node:
+    return _Leaf(entries) if height == 0 else _Branch(entries)
+
+
+def _fit(height: int, entries: list) -> List[Node]:
+    """Pack entries into as few nodes as possible, of even size, none larger than _MAX."""
+    if len(entries) <= _MAX:
+        return [_make(height, entries)]
+    parts = -(-len(entries) // _MAX)
+    step = -(-len(entries) // parts)
+    return [_make(height, entries[i:i + step]) for i in range(0, len(entries), step)]
+
+
+def _branch_of(children: list) -> Optional[Node]:
+    if not children:
+        return None
+    return children[0] if len(children) == 1 else _Branch(children)
+
+
+def _root_of(nodes: List[Node]) -> Node:
+    root = nodes[0] if len(nodes) == 1 else _Branch(nodes)
+    while isinstance(root, _Branch) and len(root.children) == 1:
+        root = root.children[0]
+    return root
+
+
+def _build(items: list) -> Optional[Node]:
+    if not items:
+        return None
+    level: List[Node] = [_Leaf(items[i:i + _MAX]) for i in range(0, len(items), _MAX)]
+    while len(level) > 1:
+        level = [_Branch(level[i:i + _MAX]) for i in range(0, len(level), _MAX)]
+    return level[0]
+
+
+def _get(node: Node, index: int) -> Any:
+    while isinstance(node, _Branch):
+        child, index = node.locate(index)
+        node = node.children[child]
+    return node.items[index]
+
+
+def _set(node: Node, index: int, value: Any) -> Node:
+    if isinstance(node, _Leaf):
+        items = node.items.copy()
+        items[index] = value
+        return _Leaf(items)
+    child, index = node.locate(index)
+    children = node.children.copy()
+    children[child] = _set(children[child], index, value)
+    return _Branch(children)
+
+
+def _insert(node: Node, index: int, value: Any) -> List[Node]:
+    if isinstance(node, _Leaf):
+        return _fit(0, node.items[:index] + [value] + node.items[index:])
+    child, index = node.locate(index)
+    children = node.children[:child] + _insert(node.children[child], index, value) + node.children[child + 1:]
+    return _fit(node.height, children)
+
+
+def _delete(node: Node, index: int) -> Optional[Node]:
+    if isinstance(node, _Leaf):
+        items = node.items[:index] + node.items[index + 1:]
+        return _Leaf(items) if items else None
+    child, index = node.locate(index)
+    children = node.children.copy()
+    replacement = _delete(children[child], index)
+    if replacement is None:
+        del children[child]
+    else:
+        children[child] = replacement
+        if len(replacement.entries) < _MIN and len(children) > 1:
+            left = child if child + 1 < len(children) else child - 1
+            merged = children[left].entries + children[left + 1].entries
+            children[left:left + 2] = _fit(node.height - 1, merged)
+    return _Branch(children) if children else None
+
+
+def _join(left: Optional[Node], right: Optional[Node]) -> List[Node]:
+    """Concatenate two trees, returning one or two nodes of the taller tree's height."""
+    if left is None:
+        return [right]
+    if right is None:
+        return [left]
+    if left.height == right.height:
+        return _fit(left.height, left.entries + right.entries)
+    if left.height > right.height:
+        return _fit(left.height, left.children[:-1] + _join(left.children[-1], right))
+    return _fit(right.height, _join(left, right.children[0]) + right.children[1:])
+
+
+def _concat(left: Optional[Node], right: Optional[Node]) -> Optional[Node]:
+    if left is None or right is None:
+        return left if right is None else right
+    return _root_of(_join(left, right))
+
+
+def _split(node: Optional[Node], index: int) -> Tuple[Optional[Node], Optional[Node]]:
+    """Split a tree into the elements before `index` and those from `index` on, sharing every untouched node."""
+    if node is None or index <= 0:
+        return None, node
+    if index >= node.size:
+        return node, None
+    if isinstance(node, _Leaf):
+        return _Leaf(node.items[:index]), _Leaf(node.items[index:])
+    child, index = node.locate(index)
+    if index == 0:
+        return _branch_of(node.children[:child]), _branch_of(node.children[child:])
+    left, right = _split(node.children[child], index)
+    return (_concat(_branch_of(node.children[:child]), left),
+            _concat(right, _branch_of(node.children[child + 1:])))
+
+
+def _leaves(node: Optional[Node]) -> Iterator[_Leaf]:
+    if node is None:
+        return
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        if isinstance(current, _Leaf):
+            yield current
+        else:
+            stack.extend(reversed(current.children))
+
+
+class BList(MutableSequence):
+    def __init__(self, iterable: Iterable = ()) -> None:
+        """
+        A list with O(log n) insertion and deletion anywhere, and O(log n) concatenation and slicing.
+        :param iterable: The initial elements.
+        """
+        self._root: Optional[Node] = _build(list(iterable))
+
+    @classmethod
+    def _from_root(cls, root: Optional[Node]) -> "BList":
+        instance = cls.__new__(cls)
+        instance._root = root
+        return instance
+
+    def __len__(self) -> int:
+        return 0 if self._root is None else self._root.size
+
+    def _index(self, index: int) -> int:
+        size = len(self)
+        if index < 0:
+            index += size
+        if not 0 <= index < size:
+            raise IndexError("BList index out of range")
+        return index
+
+    def __getitem__(self, index: Union[int, slice]) -> Any:
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step == 1:
+                _, rest = _split(self._root, start)
+                middle, _ = _split(rest, max(stop - start, 0))
+                return self._from_root(middle)
+            return BList(self[i] for i in range(start, stop, step))
+        return _get(self._root, self._index(index))
+
+    def __setitem__(self, index: Union[int, slice], value: Any) -> None:
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step == 1:
+                left, rest = _split(self._root, start)
+                _, right = _split(rest, max(stop - start, 0))
+                values = value._root if isinstance(value, BList) else _build(list(value))
+                self._root = _concat(_concat(left, values), right)
+                return
+            positions = range(start, stop, step)
+            values = list(value)
+            if len(values) != len(positions):
+                raise ValueError(f"attempt to assign sequence of size {len(values)} to extended slice of size "
+                                 f"{len(positions)}")
+            for position, item in zip(positions, values):
+                self._root = _set(self._root, position, item)
+            return
+        self._root = _set(self._root, self._index(index), value)
+
+    def __delitem__(self, index: Union[int, slice]) -> None:
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step == 1:
+                left, rest = _split(self._root, start)
+                _, right = _split(rest, max(stop - start, 0))
+                self._root = _concat(left, right)
+                return
+            for position in sorted(range(start, stop, step), reverse=True):
+                del self[position]
+            return
+        root = _delete(self._root, self._index(index))
+        while isinstance(root, _Branch) and len(root.children) == 1:
+            root = root.children[0]
+        self._root = root
+
+    def insert(self, index: int, value: Any) -> None:
+        size = len(self)
+        if index < 0:
+            index = max(index + size, 0)
+        index = min(index, size)
+        if self._root is None:
+            self._root = _Leaf([value])
+            return
+        self._root = _root_of(_insert(self._root, index, value))
+
+    def append(self, value: Any) -> None:
+        self.insert(len(self), value)
+
+    def extend(self, values: Iterable) -> None:
+        other = values._root if isinstance(values, BList) else _build(list(values))
+        self._root = _concat(self._root, other)
+
+    def __iadd__(self, values: Iterable) -> "BList":
+        self.extend(values)
+        return self
+
+    def __add__(self, other: "BList") -> "BList":
+        other_root = other._root if isinstance(other, BList) else _build(list(other))
+        return self._from_root(_concat(self._root, other_root))
+
+    def __iter__(self) -> Iterator[Any]:
+        for leaf in _leaves(self._root):
+            yield from leaf.items
+
+    def __reversed__(self) -> Iterator[Any]:
+        for leaf in reversed(list(_leaves(self._root))):
+            yield from reversed(leaf.items)
+
+    def clear(self) -> None:
+        self._root = None
+
+    def copy(self) -> "BList":
+        return self._from_root(self._root)  # O(1), the tree is shared and copied lazily on write.
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, (BList, list)) or len(self) != len(other):
+            return False
+        return all(a == b for a, b in zip(self, other))
+
+    def __repr__(self) -> str:
+        return f"BList({list(islice(self, 10))!r}{'...' if len(self) > 10 else ''})"
+
+
+# ------------------------------------------------------------------------------------------------
+
+
+def sequence_api():
+    b = BList(range(10))
+    b.insert(5, "mid")
+    del b[0]
+    print(b, len(b))  # BList([1, 2, 3, 4, 'mid', 5, 6, 7, 8, 9]) 10
+    window = b[2:6]  # shares leaves with b
+    b[3] = "changed"  # copy on write, window is unaffected
+    print(window)  # BList([3, 4, 'mid', 5])
+    print(b + BList("xy"))  # BList([1, 2, 3, 'changed', 'mid', 5, 6, 7, 8, 9]...)
+
+
+def benchmark_random_insertion(size: int = 1_000_000, operations: int = 20_000):
+    plain, tree = list(range(size)), BList(range(size))
+    positions = [random.randrange(size) for _ in range(operations)]
+
+    def churn(sequence):
+        for position in positions:
+            sequence.insert(position, -1)
+            del sequence[position]
+
+    print(f"{size:,} elements, {operations:,} random insert + delete pairs")
+    print(f"list:  {timeit.timeit(lambda: churn(plain), number=1):.3f}s")
+    print(f"BList: {timeit.timeit(lambda: churn(tree), number=1):.3f}s")
+    print(f"slice [n/4:3n/4]  list: {timeit.timeit(lambda: plain[size // 4:3 * size // 4], number=10) / 10 * 1e3:.2f}ms"
+          f"  BList: {timeit.timeit(lambda: tree[size // 4:3 * size // 4], number=10) / 10 * 1e3:.2f}ms")
+
+
+if __name__ == '__main__':
+    sequence_api()
+    benchmark_random_insertion()
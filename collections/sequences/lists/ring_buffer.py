@@ -0,0 +1,234 @@
+"""
+A list makes a tempting rolling window (see `collections/sequences/list.py`): `window.append(x)` followed by
+`window.pop(0)` once it is full.  But `pop(0)` shifts every remaining pointer one slot left, O(n) per event, and the
+list keeps growing and shrinking its allocation as it goes.  (`collections.deque(maxlen=n)` fixes the O(n) but still
+boxes every value and can't be handed to numpy without a copy.)
+
+`RingBuffer(capacity, dtype)` preallocates one numpy array of `capacity` slots, once, and never allocates again.  Two
+unbounded counters, `head` (the oldest element) and `tail` (one past the newest), never wrap; the slot for logical
+position `p` is `p % capacity`.  Under the usual `append` / `popleft` pattern each of them only ever increases
+(`appendleft` and `pop` step them back down):
+
+    capacity 6, head=4, tail=9        slot:  0   1   2   3   4   5
+                                           [ 7 | 8 | 9 | . | 5 | 6 ]
+                                             \\_ segment 2 _/   \\ seg 1 /      window = 5 6 7 8 9
+
+-> `append` / `appendleft` / `pop` / `popleft` are O(1)
+-> `overwrite=True` turns a full buffer into a sliding window: an append silently drops the oldest element
+-> `segments()` returns the window as (at most) two numpy *views* of the storage, oldest first, so reductions such as
+   `mean()` run vectorised with no copy; `percentile()` needs the values in one piece and reuses a scratch array
+
+Note: Single-producer / single-consumer use from two threads is safe without a lock (under the GIL): the producer only
+ever calls `append` (writing the slot *before* advancing `tail`) and the consumer only ever calls `popleft` (reading the
+slot *before* advancing `head`), so neither writes a counter the other writes.  `overwrite=True`, `appendleft` and
+`pop` move the other side's counter and are for single threaded use only.
+"""
+import threading
+import timeit
+from collections.abc import Sequence
+from typing import Any, Iterator, Tuple
+
+import numpy as np
+
+
+class RingBuffer(Sequence):
+    def __init__(self, capacity: int, dtype: Any = np.float64, overwrite: bool = False) -> None:
+        """
+        A fixed capacity double ended queue over a preallocated numpy array.
+        :param capacity: The maximum number of elements held.
+        :param dtype: The numpy dtype of the elements.
+        :param overwrite: When full, appending drops the oldest element instead of raising IndexError.
+        """
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self.overwrite = overwrite
+        self._data = np.empty(capacity, dtype=dtype)
+        self._scratch = np.empty(capacity, dtype=dtype)
+        self._head = 0
+        self._tail = 0
+
+    @property
+    def dtype(self) -> np.dtype:
+        return self._data.dtype
+
+    def __len__(self) -> int:
+        return self._tail - self._head
+
+    @property
+    def full(self) -> bool:
+        return len(self) == self.capacity
+
+    def __getitem__(self, index: int) -> Any:
+        size = len(self)
+        if isinstance(index, slice):
+            return self.to_array()[index]
+        if index < 0:
+            index += size
+        if not 0 <= index < size:
+            raise IndexError("RingBuffer index out of range")
+        return self._data[(self._head + index) % self.capacity]
+
+    def __iter__(self) -> Iterator[Any]:
+        for segment in self.segments():
+            yield from segment.tolist()
+
+    def __repr__(self) -> str:
+        return f"RingBuffer({self.to_array().tolist()!r}, capacity={self.capacity})"
+
+    # -- both ends, O(1) --------------------------------------------------------------------------
+
+    def append(self, value: Any) -> None:
+        if self._tail - self._head == self.capacity:
+            if not self.overwrite:
+                raise IndexError("append to a full RingBuffer")
+            self._head += 1
+        self._data[self._tail % self.capacity] = value
+        self._tail += 1
+
+    def appendleft(self, value: Any) -> None:
+        if self._tail - self._head == self.capacity:
+            if not self.overwrite:
+                raise IndexError("appendleft to a full RingBuffer")
+            self._tail -= 1
+        self._head -= 1
+        self._data[self._head % self.capacity] = value
+
+    def pop(self) -> Any:
+        if self._tail == self._head:
+            raise IndexError("pop from an empty RingBuffer")
+        value = self._data[(self._tail - 1) % self.capacity]
+        self._tail -= 1
+        return value
+
+    def popleft(self) -> Any:
+        if self._tail == self._head:
+            raise IndexError("pop from an empty RingBuffer")
+        value = self._data[self._head % self.capacity]
+        self._head += 1
+        return value
+
+    def extend(self, values: Any) -> None:
+        """
+        Append many values with at most two slice assignments rather than one call per value.
+        :param values: Anything numpy can turn into a 1d array of this buffer's dtype.
+        """
+        values = np.asarray(values, dtype=self.dtype)
+        free = self.capacity - len(self)
+        if len(values) > free:
+            if not self.overwrite:
+                raise IndexError("extend beyond the capacity of the RingBuffer")
+            values = values[-self.capacity:]
+            self._head += max(len(values) - free, 0)
+        start = self._tail % self.capacity
+        first = min(len(values), self.capacity - start)
+        self._data[start:start + first] = values[:first]
+        self._data[:len(values) - first] = values[first:]
+        self._tail += len(values)
+
+    def clear(self) -> None:
+        self._head = self._tail = 0
+
+    # -- views & vectorised reductions ------------------------------------------------------------
+
+    def segments(self) -> Tuple[np.ndarray, ...]:
+        """Return the contents as one or two numpy views of the storage, oldest first; no data is copied."""
+        size = len(self)
+        start = self._head % self.capacity
+        if start + size <= self.capacity:
+            return (self._data[start:start + size],)
+        return self._data[start:], self._data[:start + size - self.capacity]
+
+    def to_array(self) -> np.ndarray:
+        return np.concatenate(self.segments())
+
+    def sum(self) -> Any:
+        return sum(segment.sum() for segment in self.segments())
+
+    def mean(self) -> float:
+        if not len(self):
+            raise ValueError("mean of an empty RingBuffer")
+        return float(self.sum() / len(self))
+
+    def min(self) -> Any:
+        return min(segment.min() for segment in self.segments() if len(segment))
+
+    def max(self) -> Any:
+        return max(segment.max() for segment in self.segments() if len(segment))
+
+    def percentile(self, q: Any) -> Any:
+        """
+        Return the q-th percentile(s) of the window, using a preallocated scratch array rather than a fresh copy.
+        :param q: A percentile, or sequence of percentiles, between 0 and 100.
+        """
+        segments = self.segments()
+        if len(segments) == 1:
+            window = segments[0]
+        else:
+            first = len(segments[0])
+            self._scratch[:first] = segments[0]
+            self._scratch[first:len(self)] = segments[1]
+            window = self._scratch[:len(self)]
+        return np.percentile(window, q)
+
+
+# ------------------------------------------------------------------------------------------------
+
+
+def rolling_window():
+    window = RingBuffer(4, dtype=np.int64, overwrite=True)
+    window.extend([1, 2, 3, 4, 5, 6])
+    print(list(window), window.segments())  # [3, 4, 5, 6] (array([3, 4, 5, 6]),)
+    window.append(7)
+    print(window.segments())  # (array([4, 5, 6]), array([7])), the window now wraps around the storage
+    print(window.mean(), window.percentile(50))  # 5.5 5.5
+    window.appendleft(0)
+    print(window.popleft(), window.pop(), list(window))  # 0 6 [4, 5]
+
+
+def single_producer_single_consumer(items: int = 100_000):
+    queue = RingBuffer(1024, dtype=np.int64)
+    received = []
+
+    def producer():
+        for i in range(items):
+            while queue.full:
+                pass
+            queue.append(i)
+
+    def consumer():
+        while len(received) < items:
+            if len(queue):
+                received.append(int(queue.popleft()))
+
+    threads = [threading.Thread(target=producer), threading.Thread(target=consumer)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    print(received == list(range(items)))  # True
+
+
+def benchmark_rolling_mean(events: int = 200_000, width: int = 10_000):
+    def with_list():
+        window = []
+        for i in range(events):
+            window.append(float(i))
+            if len(window) > width:
+                window.pop(0)
+        return sum(window) / len(window)
+
+    def with_ring():
+        window = RingBuffer(width, overwrite=True)
+        for i in range(events):
+            window.append(float(i))
+        return window.mean()
+
+    print(f"list append + pop(0): {timeit.timeit(with_list, number=1):.3f}s")
+    print(f"RingBuffer append:    {timeit.timeit(with_ring, number=1):.3f}s")
+
+
+if __name__ == '__main__':
+    rolling_window()
+    single_producer_single_consumer()
+    benchmark_rolling_mean()
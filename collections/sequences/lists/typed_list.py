@@ -0,0 +1,223 @@
+"""
+An empty list is 56 bytes (see `collections/sequences/list.py`), but that is only the list's own header.  A list is
+an array of *pointers*, and every element is a separate boxed Python object on the heap:
+
+    [1.5, 2.5, 3.5]  ->  3 x 8 byte pointers  +  3 x 24 byte float objects  =  96 bytes for 24 bytes of data
+
+100 million floats therefore cost ~3.2GB as a list, against 800MB as raw doubles.
+
+`TypedList(typecode)` implements the full `collections.abc.MutableSequence` API (append, extend, insert, pop, slicing,
+`del`, `in`, `index`, `count`, `reverse`, `+=` ...) on top of the standard library's `array.array`, which stores raw
+machine values back to back, so each element costs exactly its item size.  Values are boxed only for the moment they
+are read.
+
+-> `memoryview(tl.buffer())` / `tl.to_numpy()` export the storage without copying it
+-> `extend(values)` converts element by element like `list.extend` (numpy arrays are converted by numpy in one pass)
+-> `extend_from_buffer(buf)` reinterprets the raw contents of any buffer (bytes, another array, a numpy array, a mmap)
+   as values of this list's type, appending them in one memcpy
+
+Note: The typecodes are those of `array.array`: 'b' 'B' 'h' 'H' 'i' 'I' 'l' 'L' 'q' 'Q' 'f' 'd' (and 'u').  Storing a
+value that does not fit the type raises `TypeError` / `OverflowError`, exactly as array does.
+
+Note: While a memoryview (or a numpy array made by `to_numpy`) of the storage is alive the array can not change size;
+append / extend / pop raise `BufferError` until the view is released.  Writes that keep the size are fine.
+"""
+import sys
+import timeit
+from array import array
+from collections.abc import MutableSequence
+from typing import Any, Iterable, Union
+
+
+def _kind(fmt: str, itemsize: int) -> tuple:
+    # 'l' and 'q' are both int64 on most 64 bit platforms, so compare signedness / floatness and width, not letters.
+    code = fmt.lstrip("@=<>!")
+    return "f" if code in "fde" else "u" if code.isupper() else "i", itemsize
+
+
+class TypedList(MutableSequence):
+    def __init__(self, typecode: str, iterable: Iterable = ()) -> None:
+        """
+        A list of unboxed machine values.
+        :param typecode: An `array.array` typecode, e.g. 'd' for float64 or 'q' for int64.
+        :param iterable: The initial values.
+        """
+        self._array = array(typecode)
+        self.extend(iterable)
+
+    @property
+    def typecode(self) -> str:
+        return self._array.typecode
+
+    @property
+    def itemsize(self) -> int:
+        return self._array.itemsize
+
+    def _wrap(self, values: array) -> "TypedList":
+        result = TypedList.__new__(TypedList)
+        result._array = values
+        return result
+
+    # -- MutableSequence abstract methods ---------------------------------------------------------
+
+    def __getitem__(self, index: Union[int, slice]) -> Any:
+        if isinstance(index, slice):
+            return self._wrap(self._array[index])
+        return self._array[index]
+
+    def __setitem__(self, index: Union[int, slice], value: Any) -> None:
+        if isinstance(index, slice) and not isinstance(value, array):
+            value = value._array if isinstance(value, TypedList) else array(self.typecode, value)
+        self._array[index] = value
+
+    def __delitem__(self, index: Union[int, slice]) -> None:
+        del self._array[index]
+
+    def __len__(self) -> int:
+        return len(self._array)
+
+    def insert(self, index: int, value: Any) -> None:
+        self._array.insert(index, value)
+
+    # -- faster versions of the mixin methods (the mixins go element by element) ------------------
+
+    def __iter__(self):
+        return iter(self._array)
+
+    def __contains__(self, value: Any) -> bool:
+        return value in self._array
+
+    def append(self, value: Any) -> None:
+        self._array.append(value)
+
+    def extend(self, values: Iterable) -> None:
+        """Append every element of `values`, converted value by value as `list.extend` would see them."""
+        if isinstance(values, TypedList):
+            values = values._array
+        if isinstance(values, array) and values.typecode == self.typecode:
+            self._array.extend(values)
+        elif hasattr(values, "__array_interface__") and self.typecode != "u":
+            self._extend_numpy(values)
+        elif isinstance(values, (array, memoryview)):
+            self._array.fromlist(values.tolist())  # other typecodes, array.extend only takes its own
+        else:
+            self._array.extend(values)
+
+    def _extend_numpy(self, values: Any) -> None:
+        import numpy as np
+        values, target = np.asarray(values), np.dtype(self.typecode)
+        if values.ndim == 1 and np.can_cast(values.dtype, target, "safe"):
+            # Lossless conversion, done by numpy in one pass and appended as a single memcpy.
+            self._array.frombytes(memoryview(np.ascontiguousarray(values, dtype=target)).cast("B"))
+        else:
+            self._array.fromlist(values.tolist())  # raises like array does for values that do not fit
+
+    def extend_from_buffer(self, buffer: Any) -> None:
+        """
+        Append the raw contents of a buffer, its length must be a multiple of `itemsize`.
+        :param buffer: Any object supporting the buffer protocol, holding values of this list's type.
+        """
+        view = memoryview(buffer)
+        raw = view.format in ("B", "b", "c")
+        if not raw and _kind(view.format, view.itemsize) != _kind(self.typecode, self.itemsize):
+            raise TypeError(f"buffer of format {view.format!r} can not extend a TypedList of {self.typecode!r}")
+        self._array.frombytes(view.cast("B"))
+
+    def pop(self, index: int = -1) -> Any:
+        return self._array.pop(index)
+
+    def index(self, value: Any, start: int = 0, stop: int = sys.maxsize) -> int:
+        return self._array.index(value, start, stop)
+
+    def count(self, value: Any) -> int:
+        return self._array.count(value)
+
+    def reverse(self) -> None:
+        self._array.reverse()
+
+    def clear(self) -> None:
+        del self._array[:]
+
+    def __iadd__(self, values: Iterable) -> "TypedList":
+        self.extend(values)
+        return self
+
+    def __add__(self, other: "TypedList") -> "TypedList":
+        result = self._wrap(array(self.typecode, self._array))
+        result.extend(other)
+        return result
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, TypedList):
+            return self._array == other._array
+        return list(self._array) == other
+
+    def __repr__(self) -> str:
+        return f"TypedList({self.typecode!r}, {self._array.tolist()!r})"
+
+    def __sizeof__(self) -> int:
+        return object.__sizeof__(self) + sys.getsizeof(self._array)
+
+    # -- zero copy export -------------------------------------------------------------------------
+
+    def buffer(self) -> array:
+        """Return the underlying array, it supports the buffer protocol: `memoryview(tl.buffer())`."""
+        return self._array
+
+    def to_numpy(self):
+        import numpy as np
+        return np.frombuffer(self._array, dtype=self._array.typecode)
+
+    def tolist(self) -> list:
+        return self._array.tolist()
+
+
+# ------------------------------------------------------------------------------------------------
+
+
+def list_api():
+    tl = TypedList("d", [1.5, 2.5, 3.5])
+    tl.append(4.5)
+    tl.insert(0, 0.5)
+    print(tl.pop(), tl[1:3], len(tl))  # 4.5 TypedList('d', [1.5, 2.5]) 4
+    tl.extend_from_buffer(array("d", [9.0, 10.0]).tobytes())
+    del tl[::2]
+    print(tl)  # TypedList('d', [1.5, 3.5, 10.0])
+    view = memoryview(tl.buffer())
+    view[0] = 100.0  # writes straight through, no copy was made
+    print(tl[0], view.format, view.itemsize)  # 100.0 d 8
+    view.release()
+
+
+def _list_bytes(values: list) -> int:
+    return sys.getsizeof(values) + sum(sys.getsizeof(v) for v in values)
+
+
+def benchmark_memory_and_append(size: int = 10_000_000):
+    floats = [float(i) for i in range(size)]
+    typed = TypedList("d", floats)
+    print(f"list of {size:,} floats:      {_list_bytes(floats) / 1e6:8.1f}MB")
+    print(f"TypedList of {size:,} floats: {sys.getsizeof(typed) / 1e6:8.1f}MB")
+    del floats
+
+    def append_list():
+        values = []
+        for i in range(1_000_000):
+            values.append(i * 0.5)
+
+    def append_typed():
+        values = TypedList("d")
+        for i in range(1_000_000):
+            values.append(i * 0.5)
+
+    def bulk_typed():
+        TypedList("d").extend_from_buffer(typed.buffer())
+
+    print(f"1M list.append:          {timeit.timeit(append_list, number=1):.3f}s")
+    print(f"1M TypedList.append:     {timeit.timeit(append_typed, number=1):.3f}s")
+    print(f"{size // 1_000_000}M extend_from_buffer:    {timeit.timeit(bulk_typed, number=1):.3f}s")
+
+
+if __name__ == '__main__':
+    list_api()
+    benchmark_memory_and_append()
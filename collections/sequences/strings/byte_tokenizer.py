@@ -0,0 +1,220 @@
+"""
+The `Sentence` classes in `object_data_model/__iter__-__next__.py` tokenize up front: `WORDS_RE.findall(text)` builds
+a list holding a new str object for every word.  For a multi gigabyte corpus that means reading the whole file into
+memory, decoding all of it, and then holding a second copy of it as millions of small str objects (~50 bytes each
+on top of the characters themselves).
+
+`ByteTokenizer` never copies the text.  It works on a `memoryview` of the raw bytes, typically of a file opened with
+`mmap`, so the operating system pages the file in as it is read, and it only ever produces *positions*:
+
+-> `spans()` yields `(start, end)` byte offsets of each token, found by the C implemented `re.finditer`, which scans
+   any buffer in place
+-> iterating yields `memoryview` slices, zero copy windows onto the file; `decoded()` (or `decode(i)`) turns a token
+   into a str only when it is actually wanted
+-> `span_arrays()` is the vectorised mode: numpy classifies every byte as delimiter or not and finds *all* token
+   boundaries in one pass over the buffer (in blocks, so memory use stays bounded), returning two int64 arrays.  Once
+   built they give `len(tokenizer)` and random access `tokenizer[i]`
+
+In "words" mode tokens are runs of bytes that are not delimiters (ASCII whitespace by default, like `bytes.split()`);
+in "lines" mode they are the lines, without their b"\\n" (like `bytes.split(b"\\n")`, minus a trailing empty line).
+
+Note: Like the well behaved `NewStyleSentence`, a ByteTokenizer is an iterable, not an iterator: every `iter()` starts a
+fresh scan.
+
+Note: A memoryview slice keeps the mmap exported, the mmap can not be closed while one is alive.  Decode (or
+`bytes()`) tokens that must outlive the tokenizer, and `release()` views otherwise.
+"""
+import mmap
+import os
+import random
+import re
+import string
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Iterator, Optional, Tuple, Union
+
+import numpy as np
+
+Buffer = Union[bytes, bytearray, memoryview, mmap.mmap]
+
+WHITESPACE = b" \t\n\r\x0b\x0c"
+
+
+class ByteTokenizer:
+    def __init__(self, buffer: Buffer, mode: str = "words", delimiters: bytes = WHITESPACE,
+                 encoding: str = "utf-8") -> None:
+        """
+        Tokenize a bytes like object in place.
+        :param buffer: The bytes to tokenize, anything supporting the buffer protocol.
+        :param mode: "words" for runs of non delimiter bytes, "lines" for newline separated lines.
+        :param delimiters: The bytes separating words in "words" mode.
+        :param encoding: The encoding used when tokens are decoded.
+        """
+        if mode not in ("words", "lines"):
+            raise ValueError(f"mode must be 'words' or 'lines', not {mode!r}")
+        if not delimiters:
+            raise ValueError("at least one delimiter is required")
+        self.mode = mode
+        self.delimiters = bytes(delimiters)
+        self.encoding = encoding
+        self._buffer = buffer
+        self._view = memoryview(buffer).cast("B")
+        self._file = None
+        self._spans: Optional[Tuple[np.ndarray, np.ndarray]] = None
+        self._words = re.compile(b"[^" + re.escape(self.delimiters) + b"]+")
+        self._lines = re.compile(b"[^\n]*\n|[^\n]+")
+
+    @classmethod
+    def from_file(cls, path: Union[str, os.PathLike], **kwargs: Any) -> "ByteTokenizer":
+        """Open `path` with a read only mmap and tokenize it, close the tokenizer (or use `with`) when done."""
+        f = open(path, "rb")
+        if not os.fstat(f.fileno()).st_size:
+            f.close()
+            return cls(b"", **kwargs)  # an empty file can not be mmap'd
+        tokenizer = cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ), **kwargs)
+        tokenizer._file = f
+        return tokenizer
+
+    def close(self) -> None:
+        self._view.release()
+        if self._file is not None:
+            self._buffer.close()
+            self._file.close()
+            self._file = None
+
+    def __enter__(self) -> "ByteTokenizer":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    # -- streaming --------------------------------------------------------------------------------
+
+    def spans(self) -> Iterator[Tuple[int, int]]:
+        """Yield the `(start, end)` byte offsets of every token, in order, without materialising any of them."""
+        if self.mode == "words":
+            for match in self._words.finditer(self._view):
+                yield match.span()
+            return
+        view = self._view
+        for match in self._lines.finditer(view):
+            start, end = match.span()
+            yield start, end - (view[end - 1] == 10)
+
+    def __iter__(self) -> Iterator[memoryview]:
+        view = self._view
+        for start, end in self.spans():
+            yield view[start:end]
+
+    def decoded(self) -> Iterator[str]:
+        view, encoding = self._view, self.encoding
+        for start, end in self.spans():
+            yield str(view[start:end], encoding)
+
+    # -- vectorised -------------------------------------------------------------------------------
+
+    def span_arrays(self, block: int = 1 << 26) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return the start and end offsets of every token as two int64 arrays, built with numpy one block at a time.
+        :param block: The number of bytes classified at once, bounding the temporary memory used.
+        """
+        if self._spans is None:
+            data = np.frombuffer(self._view, dtype=np.uint8)
+            if self.mode == "lines":
+                self._spans = self._line_spans(data, block)
+            else:
+                self._spans = self._word_spans(data, block)
+        return self._spans
+
+    def _word_spans(self, data: np.ndarray, block: int) -> Tuple[np.ndarray, np.ndarray]:
+        is_token = np.ones(256, dtype=np.int8)
+        is_token[np.frombuffer(self.delimiters, dtype=np.uint8)] = 0
+        starts, ends, previous = [], [], 0
+        for at in range(0, len(data), block):
+            # +1 where a token starts, -1 one past where it ends; `previous` carries tokens across block boundaries.
+            flags = is_token[data[at:at + block]]
+            edges = np.diff(flags, prepend=np.int8(previous))
+            starts.append(np.flatnonzero(edges == 1) + at)
+            ends.append(np.flatnonzero(edges == -1) + at)
+            previous = flags[-1]
+        if previous:
+            ends.append(np.array([len(data)]))
+        return self._concatenate(starts), self._concatenate(ends)
+
+    def _line_spans(self, data: np.ndarray, block: int) -> Tuple[np.ndarray, np.ndarray]:
+        if not len(data):
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        newlines = self._concatenate([np.flatnonzero(data[at:at + block] == 10) + at
+                                      for at in range(0, len(data), block)])
+        ends = newlines if data[-1] == 10 else np.append(newlines, len(data))
+        starts = np.concatenate([[0], newlines[:len(ends) - 1] + 1]).astype(np.int64)
+        return starts, ends.astype(np.int64, copy=False)
+
+    @staticmethod
+    def _concatenate(parts: list) -> np.ndarray:
+        return np.concatenate(parts).astype(np.int64, copy=False) if parts else np.empty(0, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.span_arrays()[0])
+
+    def __getitem__(self, index: int) -> memoryview:
+        starts, ends = self.span_arrays()
+        return self._view[starts[index]:ends[index]]
+
+    def decode(self, index: int) -> str:
+        return str(self[index], self.encoding)
+
+
+# ------------------------------------------------------------------------------------------------
+
+
+def tokenizing():
+    tokens = ByteTokenizer(b"how now\n  brown cow\n")
+    print(list(tokens.spans()))  # [(0, 3), (4, 7), (10, 15), (16, 19)]
+    print([bytes(token) for token in tokens])  # [b'how', b'now', b'brown', b'cow']
+    print(len(tokens), tokens.decode(2))  # 4 brown
+    lines = ByteTokenizer(b"how now\n  brown cow\n", mode="lines")
+    print(list(lines.decoded()), lines.span_arrays()[0].tolist())  # ['how now', '  brown cow'] [0, 8]
+
+
+def benchmark_corpus(megabytes: int = 100):
+    vocabulary = ["".join(random.choices(string.ascii_lowercase, k=random.randint(2, 10))) for _ in range(10_000)]
+    line = (" ".join(random.choices(vocabulary, k=2_000)) + "\n").encode()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "corpus.txt")
+        with open(path, "wb") as f:
+            for _ in range(megabytes * 1_000_000 // len(line)):
+                f.write(line)
+
+        def measure(label, work):
+            start = time.perf_counter()
+            count = work()
+            elapsed = time.perf_counter() - start
+            tracemalloc.start()  # a second run, tracing allocations slows the first one down too much to time it
+            work()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"{label:<28} {count:>12,} words {elapsed:6.2f}s  peak {peak / 1e6:8.1f}MB")
+
+        def read_and_split():
+            with open(path, encoding="utf-8") as f:
+                return len(f.read().split())
+
+        def stream_spans():
+            with ByteTokenizer.from_file(path) as tokens:
+                return sum(1 for _ in tokens.spans())
+
+        def numpy_spans():
+            with ByteTokenizer.from_file(path) as tokens:
+                return len(tokens.span_arrays(block=1 << 24)[0])
+
+        print(f"{os.path.getsize(path) / 1e6:.0f}MB corpus")
+        measure("read().split()", read_and_split)
+        measure("ByteTokenizer.spans()", stream_spans)
+        measure("ByteTokenizer.span_arrays()", numpy_spans)
+
+
+if __name__ == '__main__':
+    tokenizing()
+    benchmark_corpus()
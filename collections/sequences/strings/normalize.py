@@ -0,0 +1,190 @@
+"""
+`casefold()`, `lower()` and `encode()` (see `string_methods.py`) build a brand new object on every call, even when the
+input was seen a moment ago.  A request router normalising header names does exactly that: the same few thousand names
+('Content-Type', 'content-type', 'Accept-Encoding' ...) casefolded and encoded millions of times per second, with
+every result an identical copy thrown away soon after.
+
+This module memoizes the work instead:
+
+-> `Normalizer(maxsize)` wraps `casefold` / `lower` / `encode` / `casefold_encode` in bounded LRU caches
+   (`functools.lru_cache`, implemented in C), so a hot key costs one dict lookup and the cache can never grow past
+   `maxsize` entries however many distinct (e.g. attacker controlled) keys arrive
+-> str results are `sys.intern`ed: equal results are one shared object, so later dict lookups on them compare by
+   identity first and the cached copies cost no extra memory
+-> `*_many(keys)` are bulk modes for a list of keys, every distinct key is normalised once per batch
+-> `InternPool` is a `sys.intern` backed pool that also counts how often it was hit, and how much memory sharing saved
+
+Note: The module level `casefold` / `lower` / `encode` / `casefold_encode` use a shared default Normalizer of 4,096
+entries per operation; build your own Normalizer for a different bound.
+
+Note: `sys.intern` only accepts str, so encoded results (bytes) are shared through the cache alone: a hit returns the
+same bytes object that the miss produced.
+"""
+import random
+import string
+import sys
+import timeit
+from functools import lru_cache
+from typing import Dict, Iterable, List, NamedTuple, Union
+
+
+class Normalizer:
+    def __init__(self, maxsize: int = 4096) -> None:
+        """
+        Bounded, memoized string normalisation.
+        :param maxsize: The maximum number of cached results per operation.
+        """
+        self.maxsize = maxsize
+        self.casefold = lru_cache(maxsize)(self._casefold)
+        self.lower = lru_cache(maxsize)(self._lower)
+        self.encode = lru_cache(maxsize)(self._encode)
+        self.casefold_encode = lru_cache(maxsize)(self._casefold_encode)
+
+    @staticmethod
+    def _casefold(key: str) -> str:
+        return sys.intern(key.casefold())
+
+    @staticmethod
+    def _lower(key: str) -> str:
+        return sys.intern(key.lower())
+
+    @staticmethod
+    def _encode(key: str, encoding: str = "utf-8") -> bytes:
+        return key.encode(encoding)
+
+    def _casefold_encode(self, key: str, encoding: str = "utf-8") -> bytes:
+        return self.casefold(key).encode(encoding)
+
+    # -- bulk mode --------------------------------------------------------------------------------
+
+    @staticmethod
+    def _many(function, keys: Iterable[str]) -> list:
+        keys = keys if isinstance(keys, list) else list(keys)
+        # Normalise each distinct key once, then look every key up in a plain dict (cheaper than a cache hit).
+        results: Dict[str, Union[str, bytes]] = {key: function(key) for key in set(keys)}
+        return list(map(results.__getitem__, keys))
+
+    def casefold_many(self, keys: Iterable[str]) -> List[str]:
+        return self._many(self.casefold, keys)
+
+    def lower_many(self, keys: Iterable[str]) -> List[str]:
+        return self._many(self.lower, keys)
+
+    def encode_many(self, keys: Iterable[str]) -> List[bytes]:
+        return self._many(self.encode, keys)
+
+    def casefold_encode_many(self, keys: Iterable[str]) -> List[bytes]:
+        return self._many(self.casefold_encode, keys)
+
+    # -- introspection ----------------------------------------------------------------------------
+
+    def cache_info(self) -> dict:
+        return {name: getattr(self, name).cache_info() for name in ("casefold", "lower", "encode", "casefold_encode")}
+
+    def cache_clear(self) -> None:
+        for name in ("casefold", "lower", "encode", "casefold_encode"):
+            getattr(self, name).cache_clear()
+
+
+_default = Normalizer()
+casefold = _default.casefold
+lower = _default.lower
+encode = _default.encode
+casefold_encode = _default.casefold_encode
+casefold_many = _default.casefold_many
+lower_many = _default.lower_many
+encode_many = _default.encode_many
+casefold_encode_many = _default.casefold_encode_many
+
+
+class PoolStats(NamedTuple):
+    size: int
+    hits: int
+    misses: int
+    bytes_saved: int
+
+
+class InternPool:
+    def __init__(self) -> None:
+        """A pool of interned strings that records how often each lookup found an existing copy."""
+        self._pool: Dict[str, str] = {}
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+
+    def intern(self, value: str) -> str:
+        """Return the pool's copy of `value`, adding (and `sys.intern`ing) it when it is new."""
+        shared = self._pool.get(value)
+        if shared is None:
+            self.misses += 1
+            shared = self._pool[value] = sys.intern(value)
+        elif shared is not value:
+            self.hits += 1
+            self.bytes_saved += sys.getsizeof(value)  # this duplicate can now be freed
+        else:
+            self.hits += 1
+        return shared
+
+    def intern_many(self, values: Iterable[str]) -> List[str]:
+        return [self.intern(value) for value in values]
+
+    def __contains__(self, value: str) -> bool:
+        return value in self._pool
+
+    def __len__(self) -> int:
+        return len(self._pool)
+
+    def stats(self) -> PoolStats:
+        return PoolStats(len(self._pool), self.hits, self.misses, self.bytes_saved)
+
+    def clear(self) -> None:
+        self._pool.clear()
+        self.hits = self.misses = self.bytes_saved = 0
+
+
+# ------------------------------------------------------------------------------------------------
+
+
+def memoized_normalisation():
+    first, second = casefold("Content-Type"), casefold("CONTENT-TYPE")
+    print(first, first is second)  # content-type True
+    print(casefold_encode("Accept-Encoding") is casefold_encode("Accept-Encoding"))  # True, served from the cache
+    print(casefold_many(["Host", "HOST", "host"]))  # ['host', 'host', 'host']
+    print(_default.cache_info()["casefold"].currsize)  # 6, one entry per distinct spelling
+
+    pool = InternPool()
+    names = pool.intern_many("".join(["x-request-", "id"]) for _ in range(3))
+    print(names[0] is names[2], pool.stats())  # True PoolStats(size=1, hits=2, misses=1, bytes_saved=...)
+
+
+def benchmark_router(headers: int = 2_000, requests: int = 1_000_000):
+    def name():
+        return "-".join("".join(random.choices(string.ascii_letters, k=random.randint(3, 8))) for _ in range(2))
+
+    vocabulary = [name() for _ in range(headers)]
+    weights = [1 / (rank + 1) for rank in range(headers)]  # a few names are very hot, as with real traffic
+    stream = random.choices(vocabulary, weights, k=requests)
+    normalizer = Normalizer(maxsize=4096)
+
+    def plain():
+        for header in stream:
+            header.casefold().encode()
+
+    def cached():
+        fold = normalizer.casefold_encode
+        for header in stream:
+            fold(header)
+
+    def bulk():
+        normalizer.casefold_encode_many(stream)
+
+    print(f"{requests:,} lookups over {headers:,} header names")
+    print(f"str.casefold().encode():    {timeit.timeit(plain, number=1):.3f}s")
+    print(f"casefold_encode (cached):   {timeit.timeit(cached, number=1):.3f}s")
+    print(f"casefold_encode_many:       {timeit.timeit(bulk, number=1):.3f}s")
+    print(normalizer.cache_info()["casefold_encode"])
+
+
+if __name__ == '__main__':
+    memoized_normalisation()
+    benchmark_router()
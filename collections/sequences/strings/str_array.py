@@ -0,0 +1,384 @@
+"""
+The methods in `string_methods.py` act on one string at a time, so cleaning a column of 50 million strings is a Python
+loop of 50 million method calls, each allocating a new str object.
+
+`StrArray(strings)` stores the whole column as one contiguous UTF-8 buffer and an offsets array: string `i` is
+`data[offsets[i]:offsets[i + 1]]`.
+
+    strings  'egg'  ''  'bacon'       data     e g g b a c o n
+                                       offsets  0     3 3         8
+
+The methods are then run once over the buffer with numpy rather than once per string:
+
+-> `upper` / `lower` / `casefold` / `capitalize` map every byte through a 256 entry table
+-> `strip` / `lstrip` / `rstrip` move every string's start and end inwards together, one byte per round
+-> `startswith` / `endswith` compare one fixed width window per string; `count` / `find` / `replace` locate every match
+   of the substring in the whole buffer at once and attribute them to strings with `searchsorted` on the offsets
+-> `zfill` / `center` scatter every string into a pre-filled output buffer at its padded position
+-> `encode("utf-8")` slices the buffer that already holds the encoded bytes; nothing is re-encoded
+
+Note: UTF-8 is self synchronising, an encoded substring can only match the buffer at a character boundary, so byte
+level searching is exact for any text.  Case mapping and whitespace stripping are not: 'ß'.upper() is 'SS' and
+'\\u3000' is whitespace.  Those methods are vectorised when the buffer is pure ASCII and otherwise fall back to calling
+the str method per string, in a process pool when `workers` is given.
+"""
+import random
+import string
+import timeit
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Iterable, Iterator, List, Optional, Union
+
+import numpy as np
+
+_UPPER = np.arange(256, dtype=np.uint8)
+_UPPER[ord("a"):ord("z") + 1] -= 32
+_LOWER = np.arange(256, dtype=np.uint8)
+_LOWER[ord("A"):ord("Z") + 1] += 32
+_WHITESPACE = b" \t\n\r\x0b\x0c\x1c\x1d\x1e\x1f"  # the ASCII characters str.isspace() accepts
+
+
+def _apply(strings: List[str], method: str, args: tuple) -> list:
+    return [getattr(s, method)(*args) for s in strings]
+
+
+class StrArray:
+    def __init__(self, strings: Iterable[str] = (), workers: Optional[int] = None) -> None:
+        """
+        Many strings in one UTF-8 buffer, with batched versions of the str methods.
+        :param strings: The strings to store.
+        :param workers: Processes used by the per-string fallback of non ASCII data, serial when omitted.
+        """
+        strings = strings if isinstance(strings, list) else list(strings)
+        joined = "".join(strings)
+        if joined.isascii():
+            # One encode for the whole column, and character lengths are byte lengths.
+            data, lengths = joined.encode("ascii"), np.fromiter(map(len, strings), np.int64, len(strings))
+        else:
+            encoded = [s.encode("utf-8") for s in strings]
+            data, lengths = b"".join(encoded), np.fromiter(map(len, encoded), np.int64, len(encoded))
+        offsets = np.zeros(len(strings) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        self._init(np.frombuffer(data, dtype=np.uint8), offsets, workers)
+
+    def _init(self, data: np.ndarray, offsets: np.ndarray, workers: Optional[int]) -> None:
+        self.data = data
+        self.offsets = offsets
+        self.workers = workers
+        self._ascii: Optional[bool] = None
+        self._char_offsets: Optional[np.ndarray] = None
+
+    def _new(self, data: np.ndarray, offsets: np.ndarray) -> "StrArray":
+        result = StrArray.__new__(StrArray)
+        result._init(data, offsets, self.workers)
+        return result
+
+    @property
+    def starts(self) -> np.ndarray:
+        return self.offsets[:-1]
+
+    @property
+    def ends(self) -> np.ndarray:
+        return self.offsets[1:]
+
+    @property
+    def byte_lengths(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    @property
+    def is_ascii(self) -> bool:
+        if self._ascii is None:
+            self._ascii = not len(self.data) or int(self.data.max()) < 128
+        return self._ascii
+
+    @property
+    def char_offsets(self) -> np.ndarray:
+        """Offsets in characters rather than bytes: every byte that is not a UTF-8 continuation byte starts a char."""
+        if self._char_offsets is None:
+            if self.is_ascii:
+                self._char_offsets = self.offsets
+            else:
+                firsts = np.zeros(len(self.data) + 1, dtype=np.int64)
+                np.cumsum((self.data & 0xC0) != 0x80, out=firsts[1:])
+                self._char_offsets = firsts[self.offsets]
+        return self._char_offsets
+
+    def str_len(self) -> np.ndarray:
+        return np.diff(self.char_offsets)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index: Union[int, slice, np.ndarray]) -> Any:
+        if isinstance(index, (int, np.integer)):
+            if index < 0:
+                index += len(self)
+            if not 0 <= index < len(self):
+                raise IndexError("StrArray index out of range")
+            return self.data[self.offsets[index]:self.offsets[index + 1]].tobytes().decode("utf-8")
+        return self._gather(np.arange(len(self))[index])
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.tolist())
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, StrArray):
+            return np.array_equal(self.offsets, other.offsets) and np.array_equal(self.data, other.data)
+        return self.tolist() == other
+
+    def __repr__(self) -> str:
+        head = self[:5].tolist() if len(self) > 5 else self.tolist()
+        return f"StrArray({head!r}{'...' if len(self) > 5 else ''})"
+
+    def tolist(self) -> List[str]:
+        """Decode the buffer once and slice the resulting str, instead of decoding every string separately."""
+        text = self.data.tobytes().decode("utf-8")
+        offsets = self.char_offsets.tolist()
+        return [text[start:end] for start, end in zip(offsets, offsets[1:])]
+
+    # -- helpers ----------------------------------------------------------------------------------
+
+    def _gather(self, rows: np.ndarray, starts: np.ndarray = None, ends: np.ndarray = None) -> "StrArray":
+        """Build a new StrArray out of the byte ranges [starts, ends) of the given rows."""
+        starts = self.starts[rows] if starts is None else starts
+        ends = self.ends[rows] if ends is None else ends
+        lengths = ends - starts
+        offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        # Byte j of the output comes from starts[row] + (j - offsets[row]).
+        source = np.arange(offsets[-1]) + np.repeat(starts - offsets[:-1], lengths)
+        return self._new(self.data[source], offsets)
+
+    def _fallback(self, method: str, *args: Any) -> list:
+        strings = self.tolist()
+        if not self.workers or self.workers < 2 or len(strings) < 10_000:
+            return _apply(strings, method, args)
+        size = -(-len(strings) // (self.workers * 4))
+        chunks = [strings[i:i + size] for i in range(0, len(strings), size)]
+        with ProcessPoolExecutor(self.workers) as pool:
+            parts = pool.map(_apply, chunks, [method] * len(chunks), [args] * len(chunks))
+            return [value for part in parts for value in part]
+
+    def _from_fallback(self, method: str, *args: Any) -> "StrArray":
+        return StrArray(self._fallback(method, *args), workers=self.workers)
+
+    def _matches(self, sub: bytes) -> np.ndarray:
+        """Start positions of every non overlapping (per string, leftmost first) occurrence of `sub`, sorted."""
+        width, data = len(sub), self.data
+        if width > len(data):
+            return np.empty(0, dtype=np.int64)
+        candidates = np.flatnonzero(data[:len(data) - width + 1] == sub[0])
+        for i in range(1, width):
+            candidates = candidates[data[candidates + i] == sub[i]]
+        rows = np.searchsorted(self.offsets, candidates, side="right") - 1
+        candidates = candidates[candidates + width <= self.offsets[rows + 1]]
+        if len(candidates) < 2 or not self._overlaps(sub):
+            return candidates
+        keep, last_end, last_row = [], -1, -1
+        rows = (np.searchsorted(self.offsets, candidates, side="right") - 1).tolist()
+        for position, row in zip(candidates.tolist(), rows):  # only patterns like 'aa' can overlap themselves
+            if row != last_row or position >= last_end:
+                keep.append(position)
+                last_end, last_row = position + width, row
+        return np.array(keep, dtype=np.int64)
+
+    @staticmethod
+    def _overlaps(sub: bytes) -> bool:
+        return any(sub[:i] == sub[-i:] for i in range(1, len(sub)))
+
+    # -- case mapping -----------------------------------------------------------------------------
+
+    def upper(self) -> "StrArray":
+        if not self.is_ascii:
+            return self._from_fallback("upper")
+        return self._new(_UPPER[self.data], self.offsets)
+
+    def lower(self) -> "StrArray":
+        if not self.is_ascii:
+            return self._from_fallback("lower")
+        return self._new(_LOWER[self.data], self.offsets)
+
+    def casefold(self) -> "StrArray":
+        return self.lower() if self.is_ascii else self._from_fallback("casefold")
+
+    def capitalize(self) -> "StrArray":
+        if not self.is_ascii:
+            return self._from_fallback("capitalize")
+        data = _LOWER[self.data]
+        firsts = self.starts[self.byte_lengths > 0]
+        data[firsts] = _UPPER[data[firsts]]
+        return self._new(data, self.offsets)
+
+    # -- stripping --------------------------------------------------------------------------------
+
+    def _strip(self, chars: Optional[str], left: bool, right: bool, method: str) -> "StrArray":
+        if chars is None and not self.is_ascii:
+            return self._from_fallback(method)
+        stripped = _WHITESPACE if chars is None else chars.encode("utf-8")
+        if not stripped.isascii():
+            return self._from_fallback(method, chars)
+        table = np.zeros(256, dtype=bool)
+        table[np.frombuffer(stripped, dtype=np.uint8)] = True
+        starts, ends = self.starts.copy(), self.ends.copy()
+        removed = [np.empty(0, dtype=np.int64)]
+        # Walk the ends inwards one byte per round; each round only looks at rows that moved in the previous one, so
+        # the total work is the number of stripped bytes, not the size of the buffer.
+        for edge, step, active in ((starts, 1, left), (ends, -1, right)):
+            rows = np.arange(len(self)) if active else removed[0]
+            while len(rows):
+                rows = rows[starts[rows] < ends[rows]]
+                rows = rows[table[self.data[edge[rows] - (step < 0)]]]
+                removed.append(edge[rows] - (step < 0))
+                edge[rows] += step
+        keep = np.ones(len(self.data), dtype=bool)
+        keep[np.concatenate(removed)] = False
+        offsets = np.zeros(len(self) + 1, dtype=np.int64)
+        np.cumsum(ends - starts, out=offsets[1:])
+        return self._new(self.data[keep], offsets)
+
+    def strip(self, chars: Optional[str] = None) -> "StrArray":
+        return self._strip(chars, True, True, "strip")
+
+    def lstrip(self, chars: Optional[str] = None) -> "StrArray":
+        return self._strip(chars, True, False, "lstrip")
+
+    def rstrip(self, chars: Optional[str] = None) -> "StrArray":
+        return self._strip(chars, False, True, "rstrip")
+
+    # -- searching --------------------------------------------------------------------------------
+
+    def _window_equals(self, sub: bytes, at_end: bool) -> np.ndarray:
+        width = len(sub)
+        result = self.byte_lengths >= width
+        rows = np.flatnonzero(result)
+        if width and len(rows):
+            first = (self.ends[rows] - width) if at_end else self.starts[rows]
+            window = self.data[first[:, None] + np.arange(width)]
+            result[rows] = (window == np.frombuffer(sub, dtype=np.uint8)).all(axis=1)
+        return result
+
+    def startswith(self, prefix: str) -> np.ndarray:
+        return self._window_equals(prefix.encode("utf-8"), at_end=False)
+
+    def endswith(self, suffix: str) -> np.ndarray:
+        return self._window_equals(suffix.encode("utf-8"), at_end=True)
+
+    def count(self, sub: str) -> np.ndarray:
+        """Return the number of non overlapping occurrences of `sub` in every string, as `str.count` does."""
+        if not sub:
+            return self.str_len() + 1
+        matches = self._matches(sub.encode("utf-8"))
+        rows = np.searchsorted(self.offsets, matches, side="right") - 1
+        return np.bincount(rows, minlength=len(self)).astype(np.int64)
+
+    def find(self, sub: str) -> np.ndarray:
+        """Return the lowest character index of `sub` in every string, or -1, as `str.find` does."""
+        if not sub:
+            return np.zeros(len(self), dtype=np.int64)
+        result = np.full(len(self), -1, dtype=np.int64)
+        matches = self._matches(sub.encode("utf-8"))
+        rows = np.searchsorted(self.offsets, matches, side="right") - 1
+        rows, first = np.unique(rows, return_index=True)  # matches are sorted, so the first per row is the lowest
+        positions = matches[first]
+        if self.is_ascii:
+            result[rows] = positions - self.starts[rows]
+        else:
+            firsts = np.cumsum((self.data & 0xC0) != 0x80)
+            result[rows] = np.where(positions > 0, firsts[positions - 1], 0) - self.char_offsets[rows]
+        return result
+
+    def replace(self, old: str, new: str) -> "StrArray":
+        """Replace every non overlapping occurrence of `old` with `new`, in every string, in one pass."""
+        if not old:
+            return self._from_fallback("replace", old, new)
+        old_bytes, new_bytes = old.encode("utf-8"), new.encode("utf-8")
+        matches = self._matches(old_bytes)
+        if not len(matches):
+            return self
+        removed = np.zeros(len(self.data), dtype=bool)
+        removed[(matches[:, None] + np.arange(len(old_bytes))).ravel()] = True
+        kept = self.data[~removed]
+        # Where each match lands once the matched bytes are gone: its position less the bytes removed before it.
+        at = matches - np.arange(len(matches)) * len(old_bytes)
+        data = np.insert(kept, np.repeat(at, len(new_bytes)), np.tile(np.frombuffer(new_bytes, np.uint8), len(at)))
+        rows = np.searchsorted(self.offsets, matches, side="right") - 1
+        per_row = np.bincount(rows, minlength=len(self))
+        offsets = self.offsets.copy()
+        offsets[1:] += np.cumsum(per_row) * (len(new_bytes) - len(old_bytes))
+        return self._new(data, offsets)
+
+    # -- padding ----------------------------------------------------------------------------------
+
+    def _pad(self, left: np.ndarray, right: np.ndarray, fill: int) -> "StrArray":
+        lengths = self.byte_lengths + left + right
+        offsets = np.zeros(len(self) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        data = np.full(offsets[-1], fill, dtype=np.uint8)
+        data[np.arange(len(self.data)) + np.repeat(offsets[:-1] + left - self.starts, self.byte_lengths)] = self.data
+        return self._new(data, offsets)
+
+    def center(self, width: int, fillchar: str = " ") -> "StrArray":
+        if len(fillchar) != 1:
+            raise TypeError("The fill character must be exactly one character long")
+        if not fillchar.isascii():
+            return self._from_fallback("center", width, fillchar)
+        margin = np.maximum(width - self.str_len(), 0)
+        left = margin // 2 + (margin & width & 1)  # CPython's rounding, so odd margins match str.center
+        return self._pad(left, margin - left, ord(fillchar))
+
+    def zfill(self, width: int) -> "StrArray":
+        padding = np.maximum(width - self.str_len(), 0)
+        result = self._pad(padding, np.zeros_like(padding), ord("0"))
+        # A leading sign stays in front of the zeros: swap it with the first zero.
+        rows = np.flatnonzero(padding > 0)
+        rows = rows[self.byte_lengths[rows] > 0]
+        firsts = result.starts[rows]
+        signs = np.isin(result.data[firsts + padding[rows]], np.frombuffer(b"+-", dtype=np.uint8))
+        rows, firsts = rows[signs], firsts[signs]
+        result.data[firsts] = result.data[firsts + padding[rows]]
+        result.data[firsts + padding[rows]] = ord("0")
+        return result
+
+    # -- encoding ---------------------------------------------------------------------------------
+
+    def encode(self, encoding: str = "utf-8", errors: str = "strict") -> List[bytes]:
+        if encoding.lower().replace("_", "-") in ("utf-8", "utf8") or (self.is_ascii and encoding == "ascii"):
+            raw = self.data.tobytes()
+            offsets = self.offsets.tolist()
+            return [raw[start:end] for start, end in zip(offsets, offsets[1:])]
+        return self._fallback("encode", encoding, errors)
+
+
+# ------------------------------------------------------------------------------------------------
+
+
+def batched_methods():
+    column = StrArray(["  egg ", "bacon", "-42", "", "sausage egg egg"])
+    print(column.strip().upper().tolist())  # ['EGG', 'BACON', '-42', '', 'SAUSAGE EGG EGG']
+    print(column.count("egg").tolist(), column.find("egg").tolist())  # [1, 0, 0, 0, 2] [2, -1, -1, -1, 8]
+    print(column.startswith("ba").tolist())  # [False, True, False, False, False]
+    print(column.replace("egg", "spam").tolist())  # ['  spam ', 'bacon', '-42', '', 'sausage spam spam']
+    print(column.zfill(5)[2], column.center(9, "*")[1])  # -0042 **bacon**
+    print(StrArray(["Straße", "ÉCOLE"]).casefold().tolist())  # ['strasse', 'école'] (per string fallback)
+    print(StrArray(["naïve café"]).find("café").tolist())  # [6]
+
+
+def benchmark_against_comprehensions(size: int = 2_000_000):
+    words = ["".join(random.choices(string.ascii_letters + "  ", k=random.randint(4, 24))) for _ in range(size)]
+    column = StrArray(words)
+    print(f"{size:,} strings")
+    cases = [
+        ("upper", lambda: [w.upper() for w in words], lambda: column.upper()),
+        ("strip", lambda: [w.strip() for w in words], lambda: column.strip()),
+        ("count('ab')", lambda: [w.count("ab") for w in words], lambda: column.count("ab")),
+        ("startswith('a')", lambda: [w.startswith("a") for w in words], lambda: column.startswith("a")),
+        ("replace('a', 'xy')", lambda: [w.replace("a", "xy") for w in words], lambda: column.replace("a", "xy")),
+        ("center(30)", lambda: [w.center(30) for w in words], lambda: column.center(30)),
+    ]
+    for name, plain, batched in cases:
+        print(f"{name:<20} list comprehension {timeit.timeit(plain, number=1):.3f}s"
+              f"  StrArray {timeit.timeit(batched, number=1):.3f}s")
+
+
+if __name__ == '__main__':
+    batched_methods()
+    benchmark_against_comprehensions()
@@ -0,0 +1,372 @@
+"""
+Neither the builtin dict (insertion ordered, see Note 2 in `dictionary.py`) nor the set (unordered, see `set.py`) keep
+their elements in *sorted* order.  Asking either "which keys fall between `lo` and `hi`?" means `sorted(d)` followed by
+a scan, an O(n log n) sort on every single query.
+
+`SortedDict` and `SortedSet` below keep their keys sorted at all times, so range queries become two binary searches.
+Both are built on `SortedList`, a list of sorted lists ('chunks') of roughly `load` elements each plus a list of the
+maximum of each chunk:
+
+    _maxes = [ 9,           19,            31 ]
+    _lists = [[1, 4, 9], [12, 15, 19], [22, 31]]
+
+-> finding the chunk for a value is `bisect` over `_maxes`, finding the position inside it is `bisect` over that chunk
+-> an insert or delete only shifts the elements of ONE chunk (a memmove of ~`load` pointers, effectively constant)
+-> a chunk that grows beyond `2 * load` is split in two, an empty chunk is dropped
+
+Note: Rank (`index`) and select (`sl[i]`) need the number of elements before each chunk.  These offsets are kept as a
+prefix sum that is rebuilt lazily after a mutation, which costs O(n / load), i.e. a few hundred additions at 1e6 keys.
+
+Note: Keys must be mutually comparable (`<`), just as `sorted()` requires.  Sets and dicts only need them hashable.
+"""
+import bisect
+import random
+import timeit
+from collections.abc import MutableMapping, MutableSet
+from itertools import accumulate, chain, islice
+from typing import Any, Iterable, Iterator, List, Optional, Tuple
+
+
+class SortedList:
+    def __init__(self, iterable: Iterable = (), load: int = 1000) -> None:
+        """
+        A list that keeps itself sorted, the building block of SortedSet and SortedDict.
+        :param iterable: The initial values.
+        :param load: The target chunk size, chunks are split once they exceed twice this.
+        """
+        self._load = load
+        self._len = 0
+        self._lists: List[list] = []
+        self._maxes: List[Any] = []
+        self._offsets: Optional[List[int]] = None
+        self.update(iterable)
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __iter__(self) -> Iterator[Any]:
+        return chain.from_iterable(self._lists)
+
+    def __reversed__(self) -> Iterator[Any]:
+        return chain.from_iterable(reversed(chunk) for chunk in reversed(self._lists))
+
+    def __contains__(self, value: Any) -> bool:
+        pos = bisect.bisect_left(self._maxes, value)
+        if pos == len(self._maxes):
+            return False
+        chunk = self._lists[pos]
+        return chunk[bisect.bisect_left(chunk, value)] == value
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({list(self)!r})"
+
+    def update(self, iterable: Iterable) -> None:
+        values = list(iterable)
+        if not values:
+            return
+        if self._len < len(values):
+            # Bulk loading is one sort and a re-chunk rather than many single inserts.
+            values = sorted(chain(self, values))
+            self._lists = [values[i:i + self._load] for i in range(0, len(values), self._load)]
+            self._maxes = [chunk[-1] for chunk in self._lists]
+            self._len = len(values)
+            self._offsets = None
+            return
+        for value in values:
+            self.add(value)
+
+    def add(self, value: Any) -> None:
+        self._offsets = None
+        self._len += 1
+        if not self._maxes:
+            self._lists.append([value])
+            self._maxes.append(value)
+            return
+        pos = bisect.bisect_right(self._maxes, value)
+        if pos == len(self._maxes):
+            pos -= 1
+            self._lists[pos].append(value)
+            self._maxes[pos] = value
+        else:
+            bisect.insort(self._lists[pos], value)
+        self._split(pos)
+
+    def remove(self, value: Any) -> None:
+        pos = bisect.bisect_left(self._maxes, value)
+        if pos == len(self._maxes):
+            raise ValueError(f"{value!r} not in list")
+        chunk = self._lists[pos]
+        idx = bisect.bisect_left(chunk, value)
+        if chunk[idx] != value:
+            raise ValueError(f"{value!r} not in list")
+        self._delete(pos, idx)
+
+    def discard(self, value: Any) -> None:
+        try:
+            self.remove(value)
+        except ValueError:
+            pass
+
+    def pop(self, index: int = -1) -> Any:
+        pos, idx = self._locate(index)
+        value = self._lists[pos][idx]
+        self._delete(pos, idx)
+        return value
+
+    def __getitem__(self, index: Any) -> Any:
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._len)
+            if step == 1:
+                return list(self._iter_between(start, stop))
+            return [self[i] for i in range(start, stop, step)]
+        pos, idx = self._locate(index)
+        return self._lists[pos][idx]
+
+    def __delitem__(self, index: int) -> None:
+        self._delete(*self._locate(index))
+
+    def index(self, value: Any) -> int:
+        """
+        Return the rank of `value`, the number of elements strictly less than it.
+        :param value: The value to look for, raises ValueError if missing.
+        """
+        rank = self.bisect_left(value)
+        if rank == self._len or self[rank] != value:
+            raise ValueError(f"{value!r} not in list")
+        return rank
+
+    def bisect_left(self, value: Any) -> int:
+        pos = bisect.bisect_left(self._maxes, value)
+        if pos == len(self._maxes):
+            return self._len
+        return self._offset(pos) + bisect.bisect_left(self._lists[pos], value)
+
+    def bisect_right(self, value: Any) -> int:
+        pos = bisect.bisect_right(self._maxes, value)
+        if pos == len(self._maxes):
+            return self._len
+        return self._offset(pos) + bisect.bisect_right(self._lists[pos], value)
+
+    def irange(self, minimum: Any = None, maximum: Any = None,
+               inclusive: Tuple[bool, bool] = (True, True), reverse: bool = False) -> Iterator[Any]:
+        """
+        Iterate the values between `minimum` and `maximum` without scanning anything outside the range.
+        :param minimum: The lower bound, None for unbounded.
+        :param maximum: The upper bound, None for unbounded.
+        :param inclusive: Whether each bound is itself included.
+        :param reverse: Yield from `maximum` down to `minimum` instead.
+        """
+        if minimum is None:
+            start = 0
+        else:
+            start = self.bisect_left(minimum) if inclusive[0] else self.bisect_right(minimum)
+        if maximum is None:
+            stop = self._len
+        else:
+            stop = self.bisect_right(maximum) if inclusive[1] else self.bisect_left(maximum)
+        if reverse:
+            return (self[i] for i in range(stop - 1, start - 1, -1))
+        return self._iter_between(start, stop)
+
+    def _iter_between(self, start: int, stop: int) -> Iterator[Any]:
+        if start >= stop:
+            return iter(())
+        pos, idx = self._locate(start)
+        chunks = chain([self._lists[pos][idx:]], islice(self._lists, pos + 1, None))
+        return islice(chain.from_iterable(chunks), stop - start)
+
+    def _offset(self, pos: int) -> int:
+        if self._offsets is None:
+            self._offsets = [0, *accumulate(len(chunk) for chunk in self._lists)]
+        return self._offsets[pos]
+
+    def _locate(self, index: int) -> Tuple[int, int]:
+        if index < 0:
+            index += self._len
+        if not 0 <= index < self._len:
+            raise IndexError(f"{type(self).__name__} index out of range")
+        self._offset(0)
+        pos = bisect.bisect_right(self._offsets, index) - 1
+        return pos, index - self._offsets[pos]
+
+    def _split(self, pos: int) -> None:
+        chunk = self._lists[pos]
+        if len(chunk) > 2 * self._load:
+            half = chunk[self._load:]
+            del chunk[self._load:]
+            self._maxes[pos] = chunk[-1]
+            self._lists.insert(pos + 1, half)
+            self._maxes.insert(pos + 1, half[-1])
+
+    def _delete(self, pos: int, idx: int) -> None:
+        self._offsets = None
+        self._len -= 1
+        chunk = self._lists[pos]
+        del chunk[idx]
+        if chunk:
+            self._maxes[pos] = chunk[-1]
+        else:
+            del self._lists[pos]
+            del self._maxes[pos]
+
+
+class SortedSet(MutableSet):
+    """A set whose iteration order is sorted order, supporting range, rank and select queries."""
+    def __init__(self, iterable: Iterable = (), load: int = 1000) -> None:
+        self._set = set(iterable)
+        self._list = SortedList(self._set, load=load)
+
+    def __contains__(self, value: Any) -> bool:
+        return value in self._set
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self._list)
+
+    def __reversed__(self) -> Iterator[Any]:
+        return reversed(self._list)
+
+    def __len__(self) -> int:
+        return len(self._set)
+
+    def __getitem__(self, index: Any) -> Any:
+        return self._list[index]
+
+    def __repr__(self) -> str:
+        return f"SortedSet({list(self._list)!r})"
+
+    def add(self, value: Any) -> None:
+        if value not in self._set:
+            self._set.add(value)
+            self._list.add(value)
+
+    def discard(self, value: Any) -> None:
+        if value in self._set:
+            self._set.remove(value)
+            self._list.remove(value)
+
+    def index(self, value: Any) -> int:
+        if value not in self._set:
+            raise ValueError(f"{value!r} not in set")
+        return self._list.bisect_left(value)
+
+    def irange(self, minimum: Any = None, maximum: Any = None,
+               inclusive: Tuple[bool, bool] = (True, True), reverse: bool = False) -> Iterator[Any]:
+        return self._list.irange(minimum, maximum, inclusive, reverse)
+
+    def bisect_left(self, value: Any) -> int:
+        return self._list.bisect_left(value)
+
+    def bisect_right(self, value: Any) -> int:
+        return self._list.bisect_right(value)
+
+
+class SortedDict(MutableMapping):
+    """A dict whose keys iterate in sorted order, supporting range, rank and select queries over the keys."""
+    def __init__(self, *args: Any, load: int = 1000, **kwargs: Any) -> None:
+        self._dict = dict(*args, **kwargs)
+        self._list = SortedList(self._dict, load=load)
+
+    def __getitem__(self, key: Any) -> Any:
+        return self._dict[key]
+
+    def __setitem__(self, key: Any, value: Any) -> None:
+        if key not in self._dict:
+            self._list.add(key)
+        self._dict[key] = value
+
+    def __delitem__(self, key: Any) -> None:
+        del self._dict[key]
+        self._list.remove(key)
+
+    def __contains__(self, key: Any) -> bool:
+        return key in self._dict
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self._list)
+
+    def __reversed__(self) -> Iterator[Any]:
+        return reversed(self._list)
+
+    def __len__(self) -> int:
+        return len(self._dict)
+
+    def __repr__(self) -> str:
+        return f"SortedDict({dict(self.items())!r})"
+
+    def peekitem(self, index: int = -1) -> Tuple[Any, Any]:
+        """
+        Return the `(key, value)` pair at position `index` in sorted key order, without removing it.
+        :param index: The position, negative values count from the largest key.
+        """
+        key = self._list[index]
+        return key, self._dict[key]
+
+    def popitem(self, index: int = -1) -> Tuple[Any, Any]:
+        if not self._dict:
+            raise KeyError("popitem(): dictionary is empty")  # the MutableMapping contract, not the list's IndexError
+        key = self._list.pop(index)
+        return key, self._dict.pop(key)
+
+    def index(self, key: Any) -> int:
+        if key not in self._dict:
+            raise ValueError(f"{key!r} not in dict")
+        return self._list.bisect_left(key)
+
+    def irange(self, minimum: Any = None, maximum: Any = None,
+               inclusive: Tuple[bool, bool] = (True, True), reverse: bool = False) -> Iterator[Any]:
+        return self._list.irange(minimum, maximum, inclusive, reverse)
+
+    def bisect_left(self, key: Any) -> int:
+        return self._list.bisect_left(key)
+
+    def bisect_right(self, key: Any) -> int:
+        return self._list.bisect_right(key)
+
+
+# ------------------------------------------------------------------------------------------------
+
+
+def range_queries():
+    prices = SortedDict({"banana": 3, "apple": 1, "cherry": 7, "date": 5})
+    print(list(prices))  # ['apple', 'banana', 'cherry', 'date']
+    print(list(prices.irange("b", "d")))  # ['banana', 'cherry']
+    print(prices.peekitem(0), prices.peekitem())  # ('apple', 1) ('date', 5)
+    print(prices.index("cherry"))  # 2, its rank
+
+    s = SortedSet([5, 1, 9, 3, 7])
+    print(list(s.irange(3, 7, inclusive=(False, True))))  # [5, 7]
+    print(s[1], s[-1])  # 3 9, select by position
+    s.discard(5)
+    print(s)  # SortedSet([1, 3, 7, 9])
+
+
+def benchmark_range_queries(keys: int = 10_000_000, queries: int = 5):
+    # 1e8 keys work the same way but need tens of GB of RAM for the keys alone.
+    data = {random.random(): None for _ in range(keys)}
+    sorted_dict = SortedDict(data)
+    bounds = [sorted((random.random(), random.random())) for _ in range(queries)]
+
+    def with_sorted():
+        for lo, hi in bounds:
+            ordered = sorted(data)
+            ordered[bisect.bisect_left(ordered, lo):bisect.bisect_right(ordered, hi)]
+
+    def with_irange():
+        for lo, hi in bounds:
+            list(sorted_dict.irange(lo, hi))  # the whole range, as with_sorted builds
+
+    def with_inserts():
+        for _ in range(queries):
+            key = random.random()
+            sorted_dict[key] = None
+            del sorted_dict[key]
+
+    print(f"{keys:,} keys, {queries} queries, per query:")
+    print(f"sorted(d) + slice:       {timeit.timeit(with_sorted, number=1) / queries:.4f}s")
+    print(f"list(SortedDict.irange): {timeit.timeit(with_irange, number=1) / queries:.4f}s")
+    print(f"SortedDict set + del:    {timeit.timeit(with_inserts, number=1) / queries * 1e6:.1f}us")
+
+
+if __name__ == '__main__':
+    range_queries()
+    benchmark_range_queries()
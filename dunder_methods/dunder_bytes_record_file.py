@@ -0,0 +1,350 @@
+"""
+`dunder_bytes.py` shows that everything on disk is bytes, and `dunder_bytes_struct.py` gives objects a fixed size binary
+form.  Fixed size is the key property for storage: when every record is exactly `size` bytes, record `i` lives at
+byte `header + i * size`, so it can be read in O(1) with no parsing, no index and no scanning of the records before it.
+
+    | header: magic, struct format, field names | record 0 | record 1 | record 2 | ... | record n - 1 |
+                                                ^ header   ^ header + size   n = (file size - header) // size
+
+`RecordFile` stores a collection that way:
+
+-> `append(record)` / `extend(records)` pack records into one reusable bytearray and write it out a block at a time,
+   instead of one small write per record
+-> reads go through an `mmap` of the file: `rf[i]` is one `struct.unpack_from` at a computed offset, `rf.raw(i)` is a
+   zero copy memoryview of the record's bytes, and pages are only read from disk when first touched
+-> `rf.to_numpy()` views the same mapped bytes as a numpy structured array (no copy), so whole columns can be scanned
+   vectorised: `rf.to_numpy()["price"].mean()`
+-> records are either plain tuples of a struct format, or objects of a `BinaryStruct` subclass
+
+Note: Growth is append only and append safe.  The record count is derived from the file size, so a crash part way
+through writing a record leaves a torn tail that readers simply ignore, and that is cut off the next time the file is
+opened for appending.  There is one appender at a time: mode "a" takes an exclusive `fcntl.flock` (a second appender
+gets an OSError), so the tail being cut is never another writer's record in flight.  Without fcntl (Windows) keeping
+to a single writer is up to the caller.  Readers see records appended after they mapped the file once they call
+`refresh()`.
+"""
+import json
+import mmap
+import os
+import random
+import re
+import struct
+import tempfile
+import time
+from typing import Any, Iterable, Iterator, Optional, Sequence, Tuple, Union
+
+from dunder_bytes_struct import BinaryStruct, Trade
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, keep to one appender per file yourself
+    fcntl = None
+
+_MAGIC = b"RECFILE1"
+_ALIGN = 64
+# The numpy kind of every struct code, the width comes from struct itself (native 'l' / 'n' ... differ by platform).
+_NUMPY_KINDS = {"b": "i", "B": "u", "h": "i", "H": "u", "i": "i", "I": "u", "l": "i", "L": "u", "q": "i", "Q": "u",
+                "n": "i", "N": "u", "P": "u", "e": "f", "f": "f", "d": "f"}
+
+Layout = Union[str, struct.Struct, type]
+
+
+def _align(position: int) -> int:
+    return (position + _ALIGN - 1) & ~(_ALIGN - 1)
+
+
+class RecordFile:
+    def __init__(self, path: str, mode: str = "r", buffer_records: int = 4096) -> None:
+        """
+        Open an existing record file.
+        :param path: A file created by `RecordFile.create`.
+        :param mode: "r" to read, "a" to read and append.
+        :param buffer_records: The number of appended records buffered before they are written out.
+        """
+        if mode not in ("r", "a"):
+            raise ValueError(f"mode must be 'r' or 'a', not {mode!r}")
+        self.path = path
+        self.mode = mode
+        with open(path, "rb") as f:
+            if f.read(len(_MAGIC)) != _MAGIC:
+                raise ValueError(f"{path} is not a record file")
+            length = int.from_bytes(f.read(4), "little")
+            header = json.loads(f.read(length))
+        self._header_size = _align(len(_MAGIC) + 4 + length)
+        self.format = header["format"]
+        self.fields: Tuple[str, ...] = tuple(header["fields"])
+        self._struct = struct.Struct(self.format)
+        self.size = self._struct.size
+        self.record_type: Optional[type] = None
+        self._out = None
+        self._pending = bytearray(buffer_records * self.size)
+        self._pending_count = 0
+        self._buffer_records = buffer_records
+        self._mmap: Optional[mmap.mmap] = None
+        self._count = 0
+        self._stale = False  # records were written past the end of the current map
+        if mode == "a":
+            self._out = open(path, "ab")
+            self._lock()
+            self._truncate_torn_tail()
+        self.refresh()
+
+    @classmethod
+    def create(cls, path: str, layout: Layout, fields: Sequence[str] = (), **kwargs: Any) -> "RecordFile":
+        """
+        Create an empty record file and open it for appending.
+        :param path: The file to create, replacing any existing file.
+        :param layout: A struct format (byte order prefix included, '<' recommended), a `struct.Struct` or a
+            `BinaryStruct` subclass.
+        :param fields: Names of the fields of a plain struct format, used by `to_numpy` (f0, f1 ... when omitted).
+        """
+        record_type = layout if isinstance(layout, type) and issubclass(layout, BinaryStruct) else None
+        if record_type is not None:
+            fmt, fields = record_type._struct.format, record_type._fields
+        else:
+            fmt = layout.format if isinstance(layout, struct.Struct) else layout
+        fmt = fmt if isinstance(fmt, str) else fmt.decode()
+        count = len(struct.unpack(fmt, bytes(struct.calcsize(fmt))))
+        fields = list(fields) or [f"f{i}" for i in range(count)]
+        if len(fields) != count:
+            raise ValueError(f"the format {fmt!r} has {count} fields but {len(fields)} names were given")
+        header = json.dumps({"format": fmt, "fields": fields}).encode("utf-8")
+        with open(path, "wb") as f:
+            f.write(_MAGIC + len(header).to_bytes(4, "little") + header)
+            f.truncate(_align(len(_MAGIC) + 4 + len(header)))
+        instance = cls(path, mode="a", **kwargs)
+        instance.record_type = record_type
+        return instance
+
+    @classmethod
+    def open(cls, path: str, record_type: Optional[type] = None, mode: str = "r", **kwargs: Any) -> "RecordFile":
+        """Open an existing record file, returning `record_type` (a BinaryStruct subclass) objects instead of tuples."""
+        instance = cls(path, mode=mode, **kwargs)
+        if record_type is not None:
+            if record_type._struct.format != instance.format:
+                raise ValueError(f"{record_type.__name__} does not match the file layout {instance.format!r}")
+            instance.record_type = record_type
+        return instance
+
+    def _lock(self) -> None:
+        """Hold an exclusive lock while appending, so no other appender can be mid write when the tail is cut."""
+        if fcntl is None:
+            return
+        try:
+            fcntl.flock(self._out.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self._out.close()
+            self._out = None
+            raise OSError(f"{self.path} is already open for appending elsewhere") from None
+
+    def _truncate_torn_tail(self) -> None:
+        size = os.path.getsize(self.path)
+        whole = self._header_size + (size - self._header_size) // self.size * self.size
+        if whole != size:
+            os.truncate(self.path, whole)
+
+    def refresh(self) -> None:
+        """Map the file again, making records appended (by this or any other process) since the last map visible."""
+        size = os.path.getsize(self.path)
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                pass  # a view (e.g. from to_numpy) still uses the old map, it is freed when the view is
+        self._count = (size - self._header_size) // self.size
+        self._stale = False
+        if self._count:
+            with open(self.path, "rb") as f:
+                self._mmap = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+        else:
+            self._mmap = None
+
+    # -- writing ----------------------------------------------------------------------------------
+
+    def _check_writable(self) -> None:
+        if self._out is None:
+            raise OSError(f"{self.path} is open read only, open it with mode='a' to append")
+
+    def append(self, record: Any) -> None:
+        self._check_writable()
+        offset = self._pending_count * self.size
+        if isinstance(record, BinaryStruct):
+            if record._struct.format != self.format:  # also keeps a larger record out of the next slot
+                raise TypeError(f"{type(record).__name__} does not match the file layout {self.format!r}")
+            record.pack_into(self._pending, offset)
+        else:
+            self._struct.pack_into(self._pending, offset, *record)
+        self._pending_count += 1
+        if self._pending_count == self._buffer_records:
+            self.flush()
+
+    def extend(self, records: Iterable[Any]) -> None:
+        """Append many records, a list of `record_type` objects is packed a whole buffer per `pack_many` call."""
+        if (self.record_type is None or not isinstance(records, list)
+                or not all(type(record) is self.record_type for record in records)):
+            for record in records:
+                self.append(record)
+            return
+        self._check_writable()
+        self.flush()
+        with memoryview(self._pending) as view:
+            for start in range(0, len(records), self._buffer_records):
+                batch = records[start:start + self._buffer_records]
+                self.record_type.pack_many(batch, self._pending)
+                self._out.write(view[:len(batch) * self.size])
+        self._out.flush()
+        self._stale = True
+
+    def flush(self) -> None:
+        """Write the buffered records out in one write, whole records only."""
+        if self._pending_count:
+            with memoryview(self._pending) as view:
+                self._out.write(view[:self._pending_count * self.size])
+            self._out.flush()
+            self._pending_count = 0
+            self._stale = True
+
+    def close(self) -> None:
+        if self._out is not None:
+            self.flush()
+            self._out.close()
+            self._out = None
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                pass
+            self._mmap = None
+
+    def __enter__(self) -> "RecordFile":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    # -- reading ----------------------------------------------------------------------------------
+
+    def _sync(self) -> None:
+        if self._pending_count or self._stale:
+            self.flush()
+            self.refresh()
+
+    def __len__(self) -> int:
+        self._sync()
+        return self._count
+
+    def _offset(self, index: int) -> int:
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("RecordFile index out of range")
+        return self._header_size + index * self.size
+
+    def __getitem__(self, index: int) -> Any:
+        self._sync()
+        values = self._struct.unpack_from(self._mmap, self._offset(index))
+        return values if self.record_type is None else self.record_type._from_values(values)
+
+    def raw(self, index: int) -> memoryview:
+        """Return a zero copy view of record `index`'s bytes, release it before closing the file."""
+        self._sync()
+        offset = self._offset(index)
+        return memoryview(self._mmap)[offset:offset + self.size]
+
+    def __iter__(self) -> Iterator[Any]:
+        self._sync()
+        if not self._count:
+            return
+        view = memoryview(self._mmap)[self._header_size:self._header_size + self._count * self.size]
+        try:
+            for values in self._struct.iter_unpack(view):
+                yield values if self.record_type is None else self.record_type._from_values(values)
+        finally:
+            view.release()
+
+    def dtype(self):
+        """The numpy structured dtype equivalent to the record layout."""
+        import numpy as np
+        prefix = self.format[0] if self.format[0] in "@=<>!" else "@"
+        order = {"<": "<", ">": ">", "!": ">"}.get(prefix, "=")
+        names, formats, offsets = [], [], []
+        layout = prefix
+        for count, code in _tokens(self.format):
+            piece = f"{count}{code}" if count else code
+            layout += piece
+            if code == "x":
+                continue
+            size = struct.calcsize(prefix + piece)
+            # A native layout aligns each field, so take its offset from the layout up to and including it.
+            offsets.append(struct.calcsize(layout) - size)
+            if code in "spc":
+                formats.append(f"S{size}")
+            else:
+                formats.append("?" if code == "?" else f"{order}{_NUMPY_KINDS[code]}{size}")
+            names.append(self.fields[len(names)])
+        return np.dtype({"names": names, "formats": formats, "offsets": offsets, "itemsize": self.size})
+
+    def to_numpy(self):
+        """Return every record as one numpy structured array viewing the mapped file, nothing is copied."""
+        import numpy as np
+        self._sync()
+        if not self._count:
+            return np.empty(0, dtype=self.dtype())
+        return np.frombuffer(self._mmap, dtype=self.dtype(), count=self._count, offset=self._header_size)
+
+
+def _tokens(fmt: str) -> Iterator[Tuple[int, str]]:
+    """Yield (count, code) per field of a struct format, count is only set for strings ('s', 'p') and padding ('x')."""
+    for count, code in re.findall(r"(\d*)([xcbB?hHiIlLqQnNPefdsp])", fmt):
+        if code in "spx":
+            yield int(count or 1), code
+        else:
+            for _ in range(int(count or 1)):
+                yield 0, code
+
+
+# ------------------------------------------------------------------------------------------------
+
+
+def record_file_api():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "trades.rec")
+        with RecordFile.create(path, Trade) as trades:
+            trades.extend([Trade("ACME", 10.5, 100), Trade("INITECH", 99.0, 7)])
+            trades.append(Trade("ACME", 11.0, 50))
+            print(len(trades), trades[-1])  # 3 Trade(symbol='ACME', price=11.0, quantity=50, buy=True)
+        with RecordFile.open(path, Trade) as trades:
+            column = trades.to_numpy()
+            print(column["quantity"].sum(), column[column["symbol"] == b"ACME"]["price"])  # 157 [10.5 11. ]
+            del column
+        with open(path, "ab") as f:
+            f.write(b"\x01\x02\x03")  # a torn, partly written record
+        with RecordFile.open(path, Trade, mode="a") as trades:
+            print(len(trades), os.path.getsize(path) - trades._header_size)  # 3 63, the torn tail was cut off
+
+
+def benchmark_random_access(records: int = 1_000_000, reads: int = 100_000):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "points.rec")
+        start = time.perf_counter()
+        with RecordFile.create(path, "<qdd", fields=["id", "x", "y"]) as points:
+            points.extend((i, random.random(), random.random()) for i in range(records))
+        written = time.perf_counter() - start
+
+        with RecordFile(path) as points:
+            start = time.perf_counter()
+            positions = [random.randrange(records) for _ in range(reads)]
+            for i in positions:
+                points[i]
+            random_reads = time.perf_counter() - start
+            start = time.perf_counter()
+            mean = points.to_numpy()["x"].mean()
+            scan = time.perf_counter() - start
+        print(f"{records:,} records of {struct.calcsize('<qdd')} bytes written in {written:.2f}s")
+        print(f"{reads:,} random reads: {random_reads * 1e6 / reads:.2f}us each")
+        print(f"numpy column scan (mean x = {mean:.3f}): {scan * 1e3:.1f}ms")
+
+
+if __name__ == '__main__':
+    record_file_api()
+    benchmark_random_access()
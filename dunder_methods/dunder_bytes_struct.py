@@ -0,0 +1,299 @@
+"""
+`dunder_bytes.py` covers the `__bytes__` contract: `bytes(obj)` calls `obj.__bytes__()`, which must return a bytes
+object.  Serialising many objects that way builds one small bytes object per object, and then copies each of them
+again into the final output (`b"".join(...)`, `f.write(...)`).
+
+`BinaryStruct` derives the binary layout from the class's type annotations, once, when the class is created
+(`__init_subclass__`), and compiles it into a `struct.Struct`:
+
+    class Point(BinaryStruct):          layout  <  q      d      d        one fixed size of 24 bytes
+        id: int                                    id     x      y
+        x: float
+        y: float
+
+-> `bytes(point)` packs one object, `Point.from_bytes(raw)` is the reverse
+-> `point.pack_into(buffer, offset)` writes straight into a shared `bytearray` (or mmap ...), no intermediate bytes
+-> `Point.pack_many(points)` preallocates one buffer for all of them and packs them a batch at a time with a single
+   `Struct` repeating the layout, so thousands of objects cost one C call
+-> `Point.unpack_many(buffer)` returns a lazy sequence over a memoryview: nothing is unpacked until an element is read
+
+Field types: `int` (int64), `float` (float64), `bool`, the sized types below, and `FixedBytes(n)` / `FixedStr(n)` for
+byte / UTF-8 strings stored in exactly n bytes (shorter values are NUL padded, longer ones rejected).  Trailing NULs are
+stripped when reading, so a value that itself ends in b"\0" does not round trip.
+
+Note: The layout is little endian with no padding ('<'), so the bytes are identical on every platform.
+"""
+import pickle
+import struct
+import timeit
+from itertools import chain
+from operator import attrgetter
+from typing import Any, ClassVar, Dict, Iterator, List, Sequence, Tuple, Union
+
+Buffer = Union[bytes, bytearray, memoryview]
+
+
+class Int8(int):
+    format = "b"
+
+
+class UInt8(int):
+    format = "B"
+
+
+class Int16(int):
+    format = "h"
+
+
+class UInt16(int):
+    format = "H"
+
+
+class Int32(int):
+    format = "i"
+
+
+class UInt32(int):
+    format = "I"
+
+
+class UInt64(int):
+    format = "Q"
+
+
+class Float32(float):
+    format = "f"
+
+
+_FORMATS: Dict[type, str] = {int: "q", float: "d", bool: "?"}
+
+
+def FixedBytes(size: int) -> type:
+    """A bytes field stored in exactly `size` bytes."""
+    return type(f"FixedBytes{size}", (bytes,), {"format": f"{size}s", "size": size})
+
+
+def FixedStr(size: int) -> type:
+    """A str field stored as at most `size` bytes of UTF-8."""
+    return type(f"FixedStr{size}", (str,), {"format": f"{size}s", "size": size})
+
+
+def _tuple_getter(fields: Tuple[str, ...]):
+    # attrgetter returns a bare value, not a 1-tuple, for a single name.
+    if len(fields) > 1:
+        return attrgetter(*fields)
+    if fields:
+        getter = attrgetter(fields[0])
+        return lambda obj: (getter(obj),)
+    return lambda obj: ()
+
+
+class BinaryStruct:
+    _fields: ClassVar[Tuple[str, ...]] = ()
+    _struct: ClassVar[struct.Struct]
+    _strings: ClassVar[Tuple[int, ...]] = ()  # positions of FixedStr fields, encoded / decoded around struct
+    _sized: ClassVar[Tuple[Tuple[int, int], ...]] = ()  # (position, size) of FixedStr / FixedBytes fields
+    _batch: ClassVar[int] = 1024
+    _batch_struct: ClassVar[struct.Struct]
+
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+        fields: Dict[str, type] = {}
+        for klass in reversed(cls.__mro__):
+            fields.update(getattr(klass, "__annotations__", {}))
+        fields = {name: kind for name, kind in fields.items() if not name.startswith("_")}
+        formats = []
+        for name, kind in fields.items():
+            fmt = getattr(kind, "format", None)  # str / bytes have a format *method*, only accept a format string
+            fmt = fmt if isinstance(fmt, str) else _FORMATS.get(kind)
+            if fmt is None:
+                hint = ", use FixedStr(n) / FixedBytes(n) for strings" if kind in (str, bytes) else ""
+                raise TypeError(f"{cls.__name__}.{name}: unsupported field type {kind!r}{hint}")
+            formats.append(fmt)
+        cls._fields = tuple(fields)
+        cls._struct = struct.Struct("<" + "".join(formats))
+        cls._batch_struct = struct.Struct("<" + "".join(formats) * cls._batch)
+        cls._strings = tuple(i for i, kind in enumerate(fields.values()) if issubclass(kind, str))
+        cls._sized = tuple((i, kind.size) for i, kind in enumerate(fields.values()) if issubclass(kind, (str, bytes)))
+        cls._getter = staticmethod(_tuple_getter(cls._fields))
+        cls.size = cls._struct.size
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        if len(args) > len(self._fields):
+            raise TypeError(f"{type(self).__name__} takes at most {len(self._fields)} positional arguments")
+        values = dict(zip(self._fields, args))
+        for name, value in kwargs.items():
+            if name not in self._fields or name in values:
+                raise TypeError(f"{type(self).__name__} got an unexpected or repeated argument {name!r}")
+            values[name] = value
+        for name in self._fields:
+            if name in values:
+                setattr(self, name, values[name])
+            elif not hasattr(type(self), name):
+                raise TypeError(f"{type(self).__name__} is missing the field {name!r}")
+
+    # -- single object ----------------------------------------------------------------------------
+
+    def _values(self) -> tuple:
+        values = self._getter(self)
+        if self._sized:
+            values = list(values)
+            for i in self._strings:
+                values[i] = values[i].encode("utf-8")
+            for i, size in self._sized:
+                if len(values[i]) > size:  # struct would silently truncate, possibly mid character
+                    raise ValueError(f"{self._fields[i]!r} does not fit in {size} bytes: {values[i]!r}")
+        return values
+
+    @classmethod
+    def _from_values(cls, values: tuple) -> "BinaryStruct":
+        obj = cls.__new__(cls)
+        if cls._sized:
+            values = list(values)
+            for i, _ in cls._sized:
+                values[i] = values[i].rstrip(b"\0")  # the padding added by struct
+            for i in cls._strings:
+                values[i] = values[i].decode("utf-8")
+        obj.__dict__.update(zip(cls._fields, values))
+        return obj
+
+    def __bytes__(self) -> bytes:
+        return self._struct.pack(*self._values())
+
+    def pack_into(self, buffer: Buffer, offset: int = 0) -> None:
+        """Write this object's bytes straight into `buffer` at `offset`."""
+        self._struct.pack_into(buffer, offset, *self._values())
+
+    @classmethod
+    def from_bytes(cls, buffer: Buffer, offset: int = 0) -> "BinaryStruct":
+        return cls._from_values(cls._struct.unpack_from(buffer, offset))
+
+    def __eq__(self, other: Any) -> bool:
+        if type(other) is not type(self):
+            return NotImplemented
+        return self._getter(self) == other._getter(other)
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self._fields)
+        return f"{type(self).__name__}({fields})"
+
+    # -- many objects -----------------------------------------------------------------------------
+
+    @classmethod
+    def pack_many(cls, objs: Sequence["BinaryStruct"], buffer: Buffer = None, offset: int = 0) -> Buffer:
+        """
+        Pack `objs` back to back into one buffer, a batch of objects per C call.
+        :param objs: The objects to pack.
+        :param buffer: A writable buffer to fill, a new bytearray of exactly the right size (`offset` included) when
+            omitted.
+        :param offset: Where in `buffer` the first object goes.
+        """
+        if buffer is None:
+            buffer = bytearray(offset + len(objs) * cls.size)
+        batch, values = cls._batch, cls._values
+        whole = len(objs) - len(objs) % batch
+        for start in range(0, whole, batch):
+            cls._batch_struct.pack_into(buffer, offset + start * cls.size,
+                                        *chain.from_iterable(values(obj) for obj in objs[start:start + batch]))
+        for i in range(whole, len(objs)):
+            objs[i].pack_into(buffer, offset + i * cls.size)
+        return buffer
+
+    @classmethod
+    def unpack_many(cls, buffer: Buffer) -> "StructView":
+        """Return a lazy sequence of the objects packed in `buffer`, nothing is unpacked until it is read."""
+        return StructView(cls, buffer)
+
+
+class StructView(Sequence):
+    def __init__(self, kind: type, buffer: Buffer) -> None:
+        """
+        A read only sequence of BinaryStruct objects decoded on access from a buffer.
+        :param kind: The BinaryStruct subclass stored in the buffer.
+        :param buffer: Objects packed back to back, e.g. by `pack_many`.
+        """
+        self.kind = kind
+        self._view = memoryview(buffer).cast("B")
+        if len(self._view) % kind.size:
+            raise ValueError(f"buffer length {len(self._view)} is not a multiple of {kind.__name__}.size {kind.size}")
+
+    def __len__(self) -> int:
+        return len(self._view) // self.kind.size
+
+    def __getitem__(self, index: Union[int, slice]) -> Any:
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step == 1:
+                size = self.kind.size
+                return StructView(self.kind, self._view[start * size:max(stop, start) * size])
+            return [self[i] for i in range(start, stop, step)]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("StructView index out of range")
+        return self.kind.from_bytes(self._view, index * self.kind.size)
+
+    def __iter__(self) -> Iterator[Any]:
+        from_values = self.kind._from_values
+        for values in self.kind._struct.iter_unpack(self._view):
+            yield from_values(values)
+
+    def field(self, name: str) -> List[Any]:
+        """Return one field of every object, without building the objects."""
+        position = self.kind._fields.index(name)
+        values = [values[position] for values in self.kind._struct.iter_unpack(self._view)]
+        if position in dict(self.kind._sized):
+            values = [value.rstrip(b"\0") for value in values]
+            if position in self.kind._strings:
+                values = [value.decode("utf-8") for value in values]
+        return values
+
+
+# ------------------------------------------------------------------------------------------------
+
+
+class Point(BinaryStruct):
+    id: int
+    x: float
+    y: float
+
+
+class Trade(BinaryStruct):
+    symbol: FixedStr(8)
+    price: float
+    quantity: UInt32
+    buy: bool = True
+
+
+def struct_api():
+    point = Point(1, 2.5, -1.0)
+    print(bytes(point).hex(), Point.size)  # 01000000000000000000000000000440000000000000f0bf 24
+    print(Point.from_bytes(bytes(point)) == point)  # True
+    trades = [Trade("ACME", 10.5, 100), Trade(symbol="INITECH", price=99.0, quantity=7, buy=False)]
+    packed = Trade.pack_many(trades)
+    view = Trade.unpack_many(packed)
+    print(len(packed), len(view), view[1])  # 42 2 Trade(symbol='INITECH', price=99.0, quantity=7, buy=False)
+    print(view.field("quantity"))  # [100, 7]
+
+
+def benchmark_serialisation(count: int = 500_000):
+    points = [Point(i, i * 0.5, -i * 0.25) for i in range(count)]
+    fmt = struct.Struct("<qdd")
+    print(f"{count:,} objects of 3 fields")
+    print(f"pickle.dumps(list):         {timeit.timeit(lambda: pickle.dumps(points, 5), number=1):.3f}s"
+          f"  {len(pickle.dumps(points, 5)) / count:.0f} bytes each")
+    print(f"b''.join(struct.pack(...)): "
+          f"{timeit.timeit(lambda: b''.join(fmt.pack(p.id, p.x, p.y) for p in points), number=1):.3f}s"
+          f"  {fmt.size} bytes each")
+    print(f"b''.join(map(bytes, ...)):  {timeit.timeit(lambda: b''.join(map(bytes, points)), number=1):.3f}s")
+    print(f"Point.pack_many:            {timeit.timeit(lambda: Point.pack_many(points), number=1):.3f}s")
+    packed, pickled = Point.pack_many(points), pickle.dumps(points, 5)
+    print(f"pickle.loads:               {timeit.timeit(lambda: pickle.loads(pickled), number=1):.3f}s")
+    print(f"Point.unpack_many + list:   {timeit.timeit(lambda: list(Point.unpack_many(packed)), number=1):.3f}s")
+    view, positions = Point.unpack_many(packed), range(0, count, count // 1000)
+    print(f"1,000 view[i] lookups:      {timeit.timeit(lambda: [view[i] for i in positions], number=1) * 1e3:.2f}ms")
+
+
+if __name__ == '__main__':
+    struct_api()
+    benchmark_serialisation()
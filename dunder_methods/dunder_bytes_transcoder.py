@@ -0,0 +1,238 @@
+"""
+`dunder_bytes.py` converts between bytes and str in one go: `my_bytes.decode(encoding='utf-8')` and
+`to_string.encode()`.  Applied to a multi gigabyte file that means holding the whole file as bytes, then the whole file
+again as a str (up to 4 bytes per character), then a third time as the re-encoded bytes.
+
+`Transcoder` streams instead, holding one chunk at a time:
+
+-> the file is read with `readinto` into one reusable `bytearray`, so reading allocates nothing per chunk
+-> each chunk is fed to an *incremental* decoder (`codecs.getincrementaldecoder`).  A chunk boundary can fall in the
+   middle of a multibyte character, e.g. 'é' is b'\\xc3\\xa9' in UTF-8 and a chunk may end right after b'\\xc3'.  The
+   incremental decoder keeps such an incomplete tail and prepends it to the next chunk, which a plain `bytes.decode`
+   on each chunk would reject as invalid
+-> `text()` yields the decoded str chunks, `transcode(target)` yields them re-encoded by an incremental encoder, and
+   `transcode_to(path, target)` writes the result out
+
+`parallel_transcode()` splits the input into byte ranges that are transcoded by a process pool.  That is only correct
+when any range can be decoded on its own: single byte encodings (ASCII, latin-1, the cp125x family ...) where every byte
+is one character, and UTF-8, whose continuation bytes (0b10xxxxxx) can never start a character, so a split point is
+moved forward past them to the next character boundary.
+
+Note: Stateful encodings (UTF-16 and UTF-32 with their byte order marks, ISO-2022 ...) are streamed fine by
+`Transcoder`, but are refused by `parallel_transcode`, as ranges of them can not be decoded independently.
+"""
+import codecs
+import os
+import random
+import shutil
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from typing import BinaryIO, Iterator, List, Optional, Tuple, Union
+
+Source = Union[str, os.PathLike, BinaryIO]
+
+_SINGLE_BYTE = {"ascii", "iso8859-1", "iso8859-2", "iso8859-15", "cp437", "cp850", "cp1250", "cp1251", "cp1252",
+                "cp1253", "cp1254", "cp1255", "cp1256", "cp1257", "cp1258", "koi8-r", "koi8-u", "mac-roman"}
+
+
+class Transcoder:
+    def __init__(self, source: Source, encoding: str = "utf-8", errors: str = "strict",
+                 chunk_size: int = 1 << 20) -> None:
+        """
+        Stream the contents of a binary file as text, or as text re-encoded in another encoding.
+        :param source: A path, or a binary file object opened for reading.
+        :param encoding: The encoding of the source.
+        :param errors: The decoding error handler ('strict', 'replace', 'ignore' ...).
+        :param chunk_size: The number of bytes read per chunk.
+        """
+        self.source = source
+        self.encoding = codecs.lookup(encoding).name
+        self.errors = errors
+        self.chunk_size = chunk_size
+        self._buffer = bytearray(chunk_size)
+
+    def _raw_chunks(self) -> Iterator[memoryview]:
+        """Yield views of the reusable buffer, each valid only until the next chunk is read."""
+        f = open(self.source, "rb") if isinstance(self.source, (str, os.PathLike)) else self.source
+        view = memoryview(self._buffer)
+        try:
+            while True:
+                read = f.readinto(self._buffer)
+                if not read:
+                    return
+                yield view[:read]
+        finally:
+            view.release()
+            if f is not self.source:
+                f.close()
+
+    def text(self) -> Iterator[str]:
+        """Yield the decoded text chunk by chunk, a multibyte character split between chunks is carried over."""
+        decoder = codecs.getincrementaldecoder(self.encoding)(self.errors)
+        for chunk in self._raw_chunks():
+            text = decoder.decode(chunk)
+            chunk.release()
+            if text:
+                yield text
+        tail = decoder.decode(b"", final=True)  # raises (when strict) if the input ended mid character
+        if tail:
+            yield tail
+
+    def transcode(self, encoding: str = "utf-8", errors: str = "strict") -> Iterator[bytes]:
+        """
+        Yield the text re-encoded chunk by chunk.
+        :param encoding: The target encoding.
+        :param errors: The encoding error handler ('strict', 'replace', 'xmlcharrefreplace' ...).
+        """
+        encoder = codecs.getincrementalencoder(encoding)(errors)
+        for text in self.text():
+            yield encoder.encode(text)
+        tail = encoder.encode("", final=True)
+        if tail:
+            yield tail
+
+    def transcode_to(self, target: Source, encoding: str = "utf-8", errors: str = "strict") -> int:
+        """Write the re-encoded text to a path or binary file object, returning the number of bytes written."""
+        out = open(target, "wb") if isinstance(target, (str, os.PathLike)) else target
+        written = 0
+        try:
+            for chunk in self.transcode(encoding, errors):
+                written += out.write(chunk)
+        finally:
+            if out is not target:
+                out.close()
+        return written
+
+
+# -- parallel mode -------------------------------------------------------------------------------
+
+
+def _chunk_independent(encoding: str) -> bool:
+    return codecs.lookup(encoding).name in _SINGLE_BYTE | {"utf-8"}
+
+
+def _boundaries(path: str, encoding: str, parts: int) -> List[int]:
+    size = os.path.getsize(path)
+    step = max(-(-size // parts), 1)
+    points, utf8 = [0], codecs.lookup(encoding).name == "utf-8"
+    with open(path, "rb") as f:
+        for point in range(step, size, step):
+            if utf8:
+                f.seek(point)
+                # Move past continuation bytes (at most 3) to the first byte of the next character.
+                ahead = f.read(4)
+                point += next((i for i, byte in enumerate(ahead) if byte & 0xC0 != 0x80), len(ahead))
+            if point > points[-1]:
+                points.append(point)
+    return points + [size] if points[-1] < size else points
+
+
+def _transcode_range(path: str, start: int, end: int, part: str, source: Tuple[str, str],
+                     target: Tuple[str, str], chunk_size: int) -> int:
+    with open(path, "rb") as f, open(part, "wb") as out:
+        f.seek(start)
+        decoder = codecs.getincrementaldecoder(source[0])(source[1])
+        buffer = bytearray(min(chunk_size, end - start))
+        view = memoryview(buffer)
+        written, remaining = 0, end - start
+        while remaining:
+            read = f.readinto(view[:min(len(buffer), remaining)])
+            if not read:  # the file shrank after it was split, or the range runs past its end
+                raise EOFError(f"{path}: unexpected end of file at offset {end - remaining}, "
+                               f"expected data up to offset {end}")
+            remaining -= read
+            written += out.write(decoder.decode(view[:read], final=not remaining).encode(*target))
+        return written
+
+
+def parallel_transcode(path: str, target_path: str, encoding: str = "latin-1", target_encoding: str = "utf-8",
+                       errors: str = "strict", target_errors: str = "strict", workers: Optional[int] = None,
+                       chunk_size: int = 1 << 20) -> int:
+    """
+    Transcode a file with a process pool, every worker handling one byte range; returns the number of bytes written.
+    :param path: The source file.
+    :param target_path: The destination file.
+    :param encoding: The source encoding, a single byte encoding or UTF-8.
+    :param target_encoding: The target encoding, any encoding that adds no byte order mark.
+    :param errors: The decoding error handler.
+    :param target_errors: The encoding error handler.
+    :param workers: The number of worker processes, `os.cpu_count()` when omitted.
+    :param chunk_size: The number of bytes each worker reads at a time.
+    """
+    if not _chunk_independent(encoding):
+        raise ValueError(f"{encoding!r} can not be split into independently decodable ranges, use Transcoder")
+    if "".encode(target_encoding):
+        raise ValueError(f"{target_encoding!r} writes a byte order mark, ranges can not be concatenated")
+    workers = workers or os.cpu_count() or 1
+    points = _boundaries(path, encoding, workers * 4)
+    ranges = list(zip(points, points[1:]))
+    tmp = tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(target_path)))
+    try:
+        parts = [os.path.join(tmp, f"{i}.part") for i in range(len(ranges))]
+        with ProcessPoolExecutor(workers) as pool:
+            futures = [pool.submit(_transcode_range, path, start, end, part, (encoding, errors),
+                                   (target_encoding, target_errors), chunk_size)
+                       for (start, end), part in zip(ranges, parts)]
+            written = sum(future.result() for future in futures)
+        with open(target_path, "wb") as out:
+            for part in parts:
+                with open(part, "rb") as f:
+                    shutil.copyfileobj(f, out, 1 << 20)
+        return written
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+# ------------------------------------------------------------------------------------------------
+
+
+def split_characters():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "café.txt")
+        with open(path, "wb") as f:
+            f.write("naïve café, 日本語\n".encode("utf-8"))
+        # 5 byte chunks: several multibyte characters are cut in two, the incremental decoder stitches them together.
+        print("".join(Transcoder(path, chunk_size=5).text()), end="")  # naïve café, 日本語
+        print(b"".join(Transcoder(path, chunk_size=5).transcode("ascii", "xmlcharrefreplace")))
+        # b'na&#239;ve caf&#233;, &#26085;&#26412;&#35486;\n'
+        target = os.path.join(tmp, "latin.txt")
+        print(Transcoder(path, chunk_size=5).transcode_to(target, "latin-1", "replace"))  # 16
+
+
+def benchmark_large_file(megabytes: int = 200):
+    line = "".join(random.choices("abcdefghijklmnopqrstuvwxyzàéèüöß ", k=99)) + "\n"
+    with tempfile.TemporaryDirectory() as tmp:
+        source, target = os.path.join(tmp, "source.txt"), os.path.join(tmp, "target.txt")
+        with open(source, "w", encoding="latin-1") as f:
+            for _ in range(megabytes * 10_000):
+                f.write(line)
+
+        def whole_file():
+            with open(source, "rb") as f:
+                data = f.read().decode("latin-1").encode("utf-8")
+            with open(target, "wb") as f:
+                f.write(data)
+
+        def streamed():
+            Transcoder(source, "latin-1").transcode_to(target, "utf-8")
+
+        def parallel():
+            parallel_transcode(source, target, "latin-1", "utf-8")
+
+        print(f"{os.path.getsize(source) / 1e6:.0f}MB latin-1 -> utf-8 on {os.cpu_count()} cores")
+        for label, work in (("read().decode().encode()", whole_file), ("Transcoder", streamed),
+                            ("parallel_transcode", parallel)):
+            tracemalloc.start()
+            start = time.perf_counter()
+            work()
+            elapsed = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"{label:<26} {elapsed:6.2f}s  peak {peak / 1e6:8.1f}MB (this process)")
+
+
+if __name__ == '__main__':
+    split_characters()
+    benchmark_large_file()